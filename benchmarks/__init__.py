@@ -0,0 +1,5 @@
+"""
+Offline benchmarks. Each module can be run on its own, e.g.
+
+    python -m benchmarks.options_pickle
+"""
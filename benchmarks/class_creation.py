@@ -0,0 +1,65 @@
+"""
+Classes per second created by SingleDispatchMetaClass and
+ChainedPropsMetaClass, for classes with n methods (two overloads each) or
+n chained properties.
+
+    python -m benchmarks.class_creation [n ...]
+"""
+import sys
+from timeit import Timer
+
+from elymetaclasses.annotations import SingleDispatchMetaClass
+from elymetaclasses.events import ChainedProps, args_from_opt
+
+
+class DispatchBase(metaclass=SingleDispatchMetaClass):
+    def method_0(self, value):
+        return value
+
+
+def make_dispatch_class(n_methods):
+    body = ['class Dispatching(DispatchBase):']
+    for i in range(n_methods):
+        body.append('    def method_{0}(self, first, second=None):\n'
+                    '        return first\n'
+                    '    def method_{0}(self, first: int, second: str=None):\n'
+                    '        return second'.format(i))
+    return '\n'.join(body)
+
+
+def make_chained_class(n_props):
+    body = ['class Chained(ChainedProps):']
+    for i in range(n_props):
+        body.append('    @property\n'
+                    '    def prop_{0}(self, opt_a, opt_b=1):\n'
+                    '        return opt_a\n'
+                    '    @args_from_opt(1)\n'
+                    '    def method_{0}(self, value, opt_a, opt_b=1):\n'
+                    '        return value'.format(i))
+    return '\n'.join(body)
+
+
+def classes_per_second(source, repeat=5):
+    code = compile(source, '<bench>', 'exec')
+    namespace = dict(DispatchBase=DispatchBase, ChainedProps=ChainedProps,
+                     args_from_opt=args_from_opt)
+
+    timer = Timer(lambda: exec(code, namespace))
+    number, _ = timer.autorange()
+    return number / min(timer.repeat(repeat, number))
+
+
+def bench(n):
+    return dict(dispatch=classes_per_second(make_dispatch_class(n)),
+                chained=classes_per_second(make_chained_class(n)))
+
+
+def main(sizes=(1, 10, 50)):
+    print('{:>6} {:>16} {:>16}'.format('n', 'dispatch [1/s]', 'chained [1/s]'))
+    for n in sizes:
+        res = bench(n)
+        print('{:>6} {dispatch:>16.0f} {chained:>16.0f}'.format(n, **res))
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1, 10, 50))
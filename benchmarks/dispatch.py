@@ -0,0 +1,67 @@
+"""
+Call overhead of module-level dispatch against functools.singledispatch
+and a hand-written isinstance chain, for n overloads on the first argument.
+
+    python -m benchmarks.dispatch [n overloads ...]
+"""
+import sys
+from functools import singledispatch
+from timeit import Timer
+
+from elymetaclasses.annotations import dispatch
+
+
+def make_types(n_overloads):
+    return [type('T{}'.format(i), (), {}) for i in range(n_overloads)]
+
+
+def make_functions(types):
+    def impl(value):
+        return value
+
+    def chain(value):
+        for cls in types:
+            if isinstance(value, cls):
+                return value
+        return value
+
+    functools_func = singledispatch(impl)
+    for cls in types:
+        functools_func.register(cls)(impl)
+
+    funcs = dict(isinstance_chain=chain, functools=functools_func)
+    for mode in ('first', 'specific'):
+        # a module name of its own, so the dispatch registry starts afresh
+        ns = dict(__name__='bench_{}_{}'.format(mode, len(types)))
+        exec('def func(value):\n    return value', ns)
+        dispatched = dispatch(mode=mode)(ns['func'])
+        for cls in types:
+            ns = dict(cls=cls)
+            exec('def func(value: cls):\n    return value', ns)
+            dispatched.register(ns['func'])
+        funcs['dispatch_' + mode] = dispatched
+    return funcs
+
+
+def bench(n_overloads, repeat=5):
+    types = make_types(n_overloads)
+    # worst case for ordered dispatch, the last overload matches
+    value = types[-1]()
+    results = dict()
+    for name, func in make_functions(types).items():
+        timer = Timer(lambda: func(value))
+        number, _ = timer.autorange()
+        results[name] = min(timer.repeat(repeat, number)) / number
+    return results
+
+
+def main(sizes=(1, 10, 100)):
+    for n_overloads in sizes:
+        print('{} overloads'.format(n_overloads))
+        for name, seconds in sorted(bench(n_overloads).items(),
+                                    key=lambda item: item[1]):
+            print('    {:<18} {:8.3f} us'.format(name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1, 10, 100))
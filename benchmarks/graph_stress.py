@@ -0,0 +1,183 @@
+"""
+Scaling of ChainedProps with the size of the property graph.
+
+Builds ChainedProps classes with n properties arranged in depth layers, split
+over an inheritance chain of classes. Layer 0 reads fan_in option keys, every
+other property reads fan_in properties of the layer below, and each of those
+is read by fan_out properties. For each n it measures class creation, the
+first evaluation of every sink, the invalidation cost of one option write and
+memory, and reports the log-log slope of each metric against n, i.e. the
+observed exponent of its complexity.
+
+    python -m benchmarks.graph_stress [--sizes 1000 10000 100000] [--json f]
+"""
+import argparse
+import gc
+import json
+import math
+import sys
+import tracemalloc
+from collections import OrderedDict
+from time import perf_counter
+
+from elymetaclasses.events import ChainedProps
+from elymetaclasses.utils import Options
+
+METRICS = ('create_s', 'first_eval_s', 'write_s', 'class_bytes',
+           'instance_bytes')
+
+
+def generate(n_props, depth=10, fan_in=2, fan_out=2, n_options=10,
+             n_classes=1) -> str:
+    """ Source of n_classes ChainedProps classes, Graph0 to Graph<n-1>, each
+    a subclass of the previous and defining a contiguous run of layers. The
+    last class has every property """
+    depth = max(1, min(depth, n_props))
+    width = n_props // depth
+    layers_per_class = -(-depth // n_classes)
+    lines = list()
+    for layer in range(depth):
+        if layer % layers_per_class == 0:
+            index = layer // layers_per_class
+            base = 'Graph{}'.format(index - 1) if index else 'ChainedProps'
+            lines.append('class Graph{}({}):'.format(index, base))
+            lines.append('    __slots__ = ()')
+
+        # the last layer takes the remainder
+        n_layer = width if layer < depth - 1 else n_props - width * layer
+        for node in range(n_layer):
+            # nodes that share node // fan_out read the same fan_in nodes
+            first = node // fan_out * fan_in
+            if layer == 0:
+                reads = ['opt_{}'.format((first + i) % n_options)
+                         for i in range(fan_in)]
+                lines.append('    @property\n'
+                             '    def p_0_{}(self, {}):\n'
+                             '        return ({}) & 1023'.format(
+                                 node, ', '.join(sorted(set(reads))),
+                                 ' + '.join(reads)))
+            else:
+                reads = ['self.p_{}_{}'.format(layer - 1, (first + i) % width)
+                         for i in range(fan_in)]
+                lines.append('    @property\n'
+                             '    def p_{}_{}(self):\n'
+                             '        return ({}) & 1023'.format(
+                                 layer, node, ' + '.join(reads)))
+    return '\n'.join(lines)
+
+
+def traced(func, *args) -> int:
+    """ bytes allocated by func and still held once it returns """
+    gc.collect()
+    tracemalloc.start()
+    keep = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return size
+
+
+def bench(n_props, depth=10, fan_in=2, fan_out=2, n_options=10, n_classes=1,
+          n_writes=5):
+    code = compile(generate(n_props, depth, fan_in, fan_out, n_options,
+                            n_classes), '<graph>', 'exec')
+    results = OrderedDict(n=n_props)
+
+    # tracemalloc slows allocation down, so time and memory are measured on
+    # separate runs
+    gc.collect()
+    start = perf_counter()
+    exec(code, dict(ChainedProps=ChainedProps))
+    results['create_s'] = perf_counter() - start
+
+    namespace = dict(ChainedProps=ChainedProps)
+    results['class_bytes'] = traced(exec, code, namespace)
+
+    cls = namespace['Graph{}'.format(n_classes - 1)]
+    depth = max(1, min(depth, n_props))
+    sinks = [name.func_name for name in cls._slot_of
+             if name.func_name.startswith('p_{}_'.format(depth - 1))]
+    opt = Options.make(('opt_{}'.format(i), i) for i in range(n_options))
+
+    def evaluate():
+        graph = cls(opt)
+        for sink in sinks:
+            getattr(graph, sink)
+        return graph
+
+    results['instance_bytes'] = traced(evaluate)
+    gc.collect()
+    start = perf_counter()
+    graph = evaluate()
+    results['first_eval_s'] = perf_counter() - start
+
+    # each write invalidates what reads the key and is then read back, so the
+    # next write invalidates as much again
+    elapsed = 0.
+    for i in range(n_writes):
+        key = 'opt_{}'.format(i % n_options)
+        start = perf_counter()
+        opt[key] = opt[key] + 1
+        elapsed += perf_counter() - start
+        for sink in sinks:
+            getattr(graph, sink)
+    results['write_s'] = elapsed / n_writes
+    return results
+
+
+def slope(points):
+    """ Least squares slope of log(y) against log(x) """
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return float('nan')
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return sxy / sxx
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 3000, 10000, 30000, 100000])
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--fan-in', type=int, default=2)
+    parser.add_argument('--fan-out', type=int, default=2)
+    parser.add_argument('--options', type=int, default=10)
+    parser.add_argument('--classes', type=int, default=1,
+                        help='length of the inheritance chain')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    # every layer adds a few frames to the getter recursion
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * args.depth + 100))
+
+    print('{:>8} {:>12} {:>14} {:>12} {:>14} {:>16}'.format(
+        'n', 'create [s]', 'first eval [s]', 'write [s]', 'class [kB]',
+        'instance [kB]'))
+    rows = list()
+    for n_props in args.sizes:
+        res = bench(n_props, args.depth, args.fan_in, args.fan_out,
+                    args.options, args.classes)
+        rows.append(res)
+        print('{n:>8} {create_s:>12.4f} {first_eval_s:>14.4f} '
+              '{write_s:>12.6f} {kb_class:>14.0f} {kb_instance:>16.0f}'.format(
+                  kb_class=res['class_bytes'] / 1e3,
+                  kb_instance=res['instance_bytes'] / 1e3, **res))
+
+    slopes = OrderedDict((metric, slope([(row['n'], row[metric])
+                                         for row in rows]))
+                         for metric in METRICS)
+    print('log-log slope against n (1 is linear):')
+    for metric, value in slopes.items():
+        print('    {:<16} {:6.2f}'.format(metric, value))
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(dict(parameters=vars(args), results=rows,
+                           slopes=slopes), fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
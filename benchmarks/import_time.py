@@ -0,0 +1,41 @@
+"""
+Import time of the package, measured in fresh interpreters.
+
+Exits with status 1 when the fastest of the runs is over budget:
+
+    python -m benchmarks.import_time [budget seconds] [module]
+"""
+import subprocess
+import sys
+
+BUDGET = 0.05
+MODULE = 'elymetaclasses.abc.io'
+
+SNIPPET = """\\
+import time
+t0 = time.perf_counter()
+import {}
+print(time.perf_counter() - t0)
+"""
+
+
+def import_time(module=MODULE, runs=5):
+    times = list()
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, '-c',
+                                       SNIPPET.format(module)])
+        times.append(float(out))
+    return min(times)
+
+
+def main(budget=BUDGET, module=MODULE):
+    seconds = import_time(module)
+    print('import {}: {:.4f} s (budget {:.4f} s)'.format(module, seconds,
+                                                         budget))
+    return seconds <= budget
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    budget = float(args.pop(0)) if args else BUDGET
+    sys.exit(0 if main(budget, *args) else 1)
@@ -0,0 +1,52 @@
+"""
+Round-trip cost of shipping Options to another process.
+
+Compares pickling against rebuilding the config key by key, which is what a
+worker had to do before Options could be pickled.
+"""
+import pickle
+import sys
+from timeit import Timer
+
+from elymetaclasses.utils import Options
+
+
+def make_options(n_keys):
+    return Options.make(('key_{}'.format(i), i) for i in range(n_keys))
+
+
+def bench(n_keys, repeat=5):
+    opt = make_options(n_keys)
+    items = list(opt.items())
+    payload = pickle.dumps(opt)
+
+    def roundtrip():
+        pickle.loads(pickle.dumps(opt))
+
+    def roundtrip_access():
+        getattr(pickle.loads(pickle.dumps(opt)), 'key_0')
+
+    def rebuild():
+        Options.make(pickle.loads(pickle.dumps(items)))
+
+    results = dict(n_keys=n_keys, payload_bytes=len(payload))
+    for name, func in (('roundtrip', roundtrip),
+                       ('roundtrip_access', roundtrip_access),
+                       ('rebuild', rebuild)):
+        timer = Timer(func)
+        number, _ = timer.autorange()
+        results[name] = min(timer.repeat(repeat, number)) / number
+    return results
+
+
+def main(sizes=(100, 1000, 5000)):
+    print('{:>8} {:>10} {:>14} {:>18} {:>14}'.format(
+        'keys', 'bytes', 'roundtrip [s]', 'rt + access [s]', 'rebuild [s]'))
+    for n_keys in sizes:
+        res = bench(n_keys)
+        print('{n_keys:>8} {payload_bytes:>10} {roundtrip:>14.6f} '
+              '{roundtrip_access:>18.6f} {rebuild:>14.6f}'.format(**res))
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (100, 1000, 5000))
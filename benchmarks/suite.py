@@ -0,0 +1,315 @@
+"""
+Micro-benchmarks for every metaclass, with results saved as JSON and
+regression gating against a stored baseline.
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --baseline baseline.json [--threshold 0.25]
+
+Exits with status 1 if any case is slower than its baseline by more than
+threshold (a fraction). Cases are selected by substring with --filter.
+"""
+import argparse
+import json
+import platform
+import sys
+from collections import OrderedDict
+from timeit import Timer
+
+from elymetaclasses.abc import HookedMetaClass
+from elymetaclasses.annotations import (SingleDispatchMetaClass,
+                                        TypeAssertMetaClass)
+from elymetaclasses.events import ChainedProps
+from elymetaclasses.utils import Options
+
+# case name -> setup function returning the callable to time
+cases = OrderedDict()
+
+
+def case(name):
+    def register(setup):
+        cases[name] = setup
+        return setup
+    return register
+
+
+def make_dispatch_class(n_overloads, mode='first'):
+    types = [type('T{}'.format(i), (), {}) for i in range(n_overloads)]
+    body = ['class Dispatching(metaclass=SingleDispatchMetaClass):',
+            '    dispatch_mode = {!r}'.format(mode),
+            '    def method(self, value):',
+            '        return value']
+    for i in range(n_overloads):
+        body.append('    def method(self, value: T{0}):\n'
+                    '        return value'.format(i))
+    namespace = dict(SingleDispatchMetaClass=SingleDispatchMetaClass)
+    namespace.update(('T{}'.format(i), cls) for i, cls in enumerate(types))
+    exec('\n'.join(body), namespace)
+    return namespace['Dispatching'](), types
+
+
+def dispatch_case(n_overloads, mode, hit_ratio):
+    """ Calls cycle over 100 values of which hit_ratio match the last
+    declared overload, the rest match none """
+    def setup():
+        obj, types = make_dispatch_class(n_overloads, mode)
+        n_hits = int(hit_ratio * 100)
+        values = [types[-1]()] * n_hits + [object()] * (100 - n_hits)
+        method = obj.method
+
+        def run():
+            for value in values:
+                method(value)
+        return run, 100
+    return setup
+
+
+for _n in (1, 10, 50):
+    for _mode in ('first', 'specific'):
+        for _hits in (1.0, 0.5, 0.0):
+            case('dispatch.{}.{}overloads.hit{:.0%}'.format(
+                _mode, _n, _hits))(dispatch_case(_n, _mode, _hits))
+
+
+@case('type_assert.call')
+def type_assert_call():
+    class Asserted(metaclass=TypeAssertMetaClass):
+        def method(self, first: int, second: str):
+            return first
+
+    method = Asserted().method
+    return lambda: method(1, 'a')
+
+
+@case('type_assert.sampled.rate1%')
+def type_assert_sampled():
+    class Sampled(metaclass=TypeAssertMetaClass):
+        type_assert_rate = 0.01
+
+        def method(self, first: int, second: str):
+            return first
+
+    method = Sampled().method
+    return lambda: method(1, 'a')
+
+
+@case('type_assert.baseline')
+def type_assert_baseline():
+    class Plain:
+        def method(self, first: int, second: str):
+            return first
+
+    method = Plain().method
+    return lambda: method(1, 'a')
+
+
+class Chained(ChainedProps):
+    __slots__ = ()
+
+    @property
+    def leaf(self, key_0, key_1=1):
+        return key_0 + key_1
+
+    @property
+    def node(self):
+        return self.leaf * 2
+
+
+def make_chain(depth):
+    """ prop_i reads prop_(i-1), prop_0 reads the option key """
+    body = ['class Deep(ChainedProps):',
+            '    @property',
+            '    def prop_0(self, key):',
+            '        return key']
+    for i in range(1, depth):
+        body.append('    @property\n'
+                    '    def prop_{0}(self):\n'
+                    '        return self.prop_{1} + 1'.format(i, i - 1))
+    namespace = dict(ChainedProps=ChainedProps)
+    exec('\n'.join(body), namespace)
+    return namespace['Deep']
+
+
+@case('chained.hit')
+def chained_hit():
+    chained = Chained(Options.make(key_0=1))
+    chained.node
+    return lambda: chained.node
+
+
+@case('chained.miss')
+def chained_miss():
+    chained = Chained(Options.make(key_0=1))
+
+    def run():
+        del chained.leaf
+        chained.node
+    return run
+
+
+def cascade_case(depth):
+    def setup():
+        cls = make_chain(depth)
+        opt = Options.make(key=0)
+        chained = cls(opt)
+        top = 'prop_{}'.format(depth - 1)
+        getattr(chained, top)
+        values = iter(range(1, 1 << 62))
+
+        def run():
+            # invalidate the whole chain and read it back
+            opt.key = next(values)
+            getattr(chained, top)
+        return run
+    return setup
+
+
+for _depth in (10, 100):
+    case('chained.cascade.depth{}'.format(_depth))(cascade_case(_depth))
+
+
+def shared_write_case(n_instances, n_reading):
+    """ one write to Options shared by n_instances, of which n_reading hold
+    a value that read the key """
+    def setup():
+        opt = Options.make(key_0=0)
+        instances = [Chained(opt) for _ in range(n_instances)]
+        values = iter(range(1, 1 << 62))
+
+        def run():
+            for chained in instances[:n_reading]:
+                chained.leaf
+            opt.key_0 = next(values)
+        run.instances = instances
+        return run
+    return setup
+
+
+for _n, _reading in ((10000, 100), (10000, 10000)):
+    case('chained.shared_write.{}instances.{}reading'.format(_n, _reading))(
+        shared_write_case(_n, _reading))
+
+
+@case('options.make.100')
+def options_make():
+    items = [('key_{}'.format(i), i) for i in range(100)]
+    return lambda: Options.make(items)
+
+
+@case('options.write')
+def options_write():
+    opt = Options.make(key=0)
+    values = iter(range(1, 1 << 62))
+
+    def run():
+        opt.key = next(values)
+    return run
+
+
+@case('options.write.callback')
+def options_write_callback():
+    opt = Options.make(key=0)
+    callback = lambda key, value: None
+    opt.set_callback('key', callback)
+    values = iter(range(1, 1 << 62))
+
+    def run():
+        opt.key = next(values)
+    run.callback = callback
+    return run
+
+
+class Hooked(metaclass=HookedMetaClass):
+    subclasshooks = ['read', 'close']
+
+
+class Provider:
+    def read(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@case('hooked.isinstance.hit')
+def hooked_hit():
+    obj = Provider()
+    return lambda: isinstance(obj, Hooked)
+
+
+@case('hooked.isinstance.miss')
+def hooked_miss():
+    obj = object()
+    return lambda: isinstance(obj, Hooked)
+
+
+@case('hooked.isinstance.cold')
+def hooked_cold():
+    obj = Provider()
+
+    def run():
+        HookedMetaClass.invalidate()
+        isinstance(obj, Hooked)
+    return run
+
+
+def measure(setup, repeat=5) -> float:
+    """ seconds per call of the callable returned by setup. Setups may return
+    (callable, n) when each call does n operations """
+    func = setup()
+    n_ops = 1
+    if isinstance(func, tuple):
+        func, n_ops = func
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number / n_ops
+
+
+def run(names, repeat=5):
+    results = OrderedDict()
+    for name in names:
+        results[name] = measure(cases[name], repeat)
+        print('{:<42} {:10.3f} us'.format(name, results[name] * 1e6))
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """ (name, baseline, result) for every case slower than its baseline by
+    more than threshold """
+    return [(name, baseline[name], seconds)
+            for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--filter', default='',
+                        help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown as a fraction of the baseline')
+    args = parser.parse_args(argv)
+
+    results = run([name for name in cases if args.filter in name], args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump(dict(python=platform.python_version(),
+                           machine=platform.machine(),
+                           results=results), fp, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['results']
+        slow = regressions(results, baseline, args.threshold)
+        for name, before, after in slow:
+            print('REGRESSION {:<31} {:10.3f} us -> {:10.3f} us'.format(
+                name, before * 1e6, after * 1e6))
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,9 @@
 __author__ = 'emil'
 
-from .annotations import (SingleDispatchMetaClass, TypeAssertMetaClass)
+from .annotations import (SingleDispatchMetaClass, TypeAssertMetaClass,
+                          dispatch)
 from .abc import HookedMetaClass, HookedBase
 
 
-all = ['SingleDispatchMetaClass', 'TypeAssertMetaClass',
+all = ['SingleDispatchMetaClass', 'TypeAssertMetaClass', 'dispatch',
        'HookedBase', 'HookedMetaClass', 'utils']
\ No newline at end of file
@@ -1,5 +1,9 @@
 from abc import ABCMeta
 from collections import Iterable
+from importlib import import_module
+from inspect import iscoroutinefunction
+from itertools import chain
+from weakref import WeakKeyDictionary, WeakSet
 
 
 def register_subclasses(klass: ABCMeta, subclassregs: Iterable):
@@ -8,30 +12,182 @@ def register_subclasses(klass: ABCMeta, subclassregs: Iterable):
     return klass
 
 
+def resolve_name(name: str):
+    """ Import the object named 'module.attr' or 'module:qual.name' """
+    if ':' in name:
+        module, _, qualname = name.partition(':')
+    else:
+        module, _, qualname = name.rpartition('.')
+
+    obj = import_module(module)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def clear_abc_caches(klass: ABCMeta):
+    """ klass._abc_caches_clear(), also on pythons before 3.7 whose ABCMeta
+    keeps its caches in attributes """
+    try:
+        caches_clear = klass._abc_caches_clear
+    except AttributeError:
+        klass._abc_cache.clear()
+        # negative caches are dropped once this counter moves
+        for meta in type(klass).__mro__:
+            if '_abc_invalidation_counter' in vars(meta):
+                meta._abc_invalidation_counter += 1
+                break
+    else:
+        caches_clear()
+
+
+# every class provides what object provides, so it is left out of the index
+_object_names = frozenset(object.__dict__)
+
+# class -> frozenset of every name defined along its mro, except in object
+_provided_names = WeakKeyDictionary()
+
+# class -> frozenset of names that resolve to coroutine functions
+_provided_coroutines = WeakKeyDictionary()
+
+# class -> {(required names, required coroutines): bool}
+_hook_results = WeakKeyDictionary()
+
+_hooked_classes = WeakSet()
+
+# called by HookedMetaClass.invalidate, e.g. to clear dispatch tables
+_invalidation_callbacks = WeakSet()
+
+
+def provided_names(C) -> frozenset:
+    try:
+        return _provided_names[C]
+    except KeyError:
+        names = frozenset(chain.from_iterable(B.__dict__
+                                              for B in C.__mro__[:-1]))
+        _provided_names[C] = names
+        return names
+
+
+def provided_coroutines(C) -> frozenset:
+    try:
+        return _provided_coroutines[C]
+    except KeyError:
+        seen = set()
+        names = set()
+        for B in C.__mro__:
+            for name, attr in B.__dict__.items():
+                if name not in seen:
+                    seen.add(name)
+                    if iscoroutinefunction(getattr(attr, '__func__', attr)):
+                        names.add(name)
+        names = _provided_coroutines[C] = frozenset(names)
+        return names
+
+
+def hook_result(subclasshooks: frozenset, C,
+                coroutinehooks: frozenset=frozenset()) -> bool:
+    try:
+        results = _hook_results[C]
+    except KeyError:
+        results = _hook_results[C] = dict()
+
+    key = (subclasshooks, coroutinehooks)
+    try:
+        return results[key]
+    except KeyError:
+        result = subclasshooks <= provided_names(C) and \
+            coroutinehooks <= provided_coroutines(C)
+        results[key] = result
+        return result
+
+
 class HookedMetaClass(ABCMeta):
-    """ Provides goosetyping by inhereting subclass hooks defined in bases"""
+    """ Provides goosetyping by inhereting subclass hooks defined in bases
+
+    coroutinehooks are subclass hooks that must also be coroutine functions.
+
+    subclassregs may name classes by string, 'module.attr' or
+    'module:qual.name'. Those are imported and registered on the first
+    isinstance or issubclass check that is not already cached. Like
+    subclasshooks they are inherited, use register_lazy for a registration
+    of one class only.
+
+    Structural checks are cached per checked class. Setting or deleting
+    attributes on hooked classes clears the caches, after mutating any other
+    class call HookedMetaClass.invalidate()
+    """
     def __new__(mcs,  name, bases, namespace):
         subclasshooks = set(namespace.pop('subclasshooks', list()))
+        coroutinehooks = set(namespace.pop('coroutinehooks', list()))
         subclassregs = set(namespace.pop('subclassregs', list()))
 
         for base in bases:
             subclasshooks.update(base.__dict__.get('_subclasshooks', set()))
+            coroutinehooks.update(base.__dict__.get('_coroutinehooks', set()))
             subclassregs.update(base.__dict__.get('_subclassregs', set()))
 
+        required = frozenset(subclasshooks) - _object_names
+        coroutines = frozenset(coroutinehooks)
+        lazyregs = list()
+
         @classmethod
         def __subclasshook__(cls, C):
-            if all(any(method in B.__dict__ for B in C.__mro__)
-                   for method in subclasshooks):
+            if lazyregs:
+                names = list(lazyregs)
+                lazyregs.clear()
+                register_subclasses(cls, map(resolve_name, names))
+
+            if hook_result(required, C, coroutines):
                 return True
             return NotImplemented
 
         namespace['_subclasshooks'] = subclasshooks
+        namespace['_coroutinehooks'] = coroutinehooks
         namespace['_subclassregs'] = subclassregs
+        namespace['_lazyregs'] = lazyregs
         namespace['__subclasshook__'] = __subclasshook__
-        return register_subclasses(super().__new__(mcs, name, bases, namespace),
-                                   subclassregs)
+        klass = super().__new__(mcs, name, bases, namespace)
+        _hooked_classes.add(klass)
+        register_subclasses(klass, (reg for reg in subclassregs
+                                    if not isinstance(reg, str)))
+        lazyregs.extend(reg for reg in subclassregs if isinstance(reg, str))
+        return klass
+
+    def register_lazy(cls, name: str):
+        """ Register the class named name, as in subclassregs, on the next
+        check against cls. Unlike register it imports nothing now, and
+        unlike subclassregs subclasses of cls do not inherit it """
+        cls._lazyregs.append(name)
+        clear_abc_caches(cls)
+
+    @staticmethod
+    def invalidate():
+        """ Forget all cached structural checks, e.g. after a class has been
+        given or stripped of a hooked method """
+        _provided_names.clear()
+        _provided_coroutines.clear()
+        _hook_results.clear()
+        for klass in _hooked_classes:
+            clear_abc_caches(klass)
+        for callback in list(_invalidation_callbacks):
+            callback()
+
+    @staticmethod
+    def on_invalidate(callback):
+        """ Call callback() whenever the caches are cleared. Held weakly """
+        _invalidation_callbacks.add(callback)
+
+    def __setattr__(cls, key, value):
+        super().__setattr__(key, value)
+        if not key.startswith('_abc_') and key != '__abstractmethods__':
+            HookedMetaClass.invalidate()
+
+    def __delattr__(cls, key):
+        super().__delattr__(key)
+        HookedMetaClass.invalidate()
 
 
 class HookedBase(metaclass=HookedMetaClass):
     subclasshooks = list()
-    subclassregs = list()
\ No newline at end of file
+    subclassregs = list()
@@ -1,17 +1,14 @@
 from .base import HookedMetaClass
 from abc import abstractmethod, abstractproperty
 from collections.abc import *
-from io import TextIOBase as _TextIOBase
-from io import TextIOWrapper as _TextIOWrapper
-from io import StringIO as _StringIO
-from io import BytesIO as _BytesIO
 from typing import Union
-from _pyio import TextIOWrapper, TextIOBase, StringIO, BytesIO
 
 
 class IOBase(metaclass=HookedMetaClass):
     subclasshooks = ['close']
-    subclassregs = [_TextIOBase, _TextIOWrapper, TextIOBase, TextIOWrapper, _StringIO, _BytesIO, StringIO, BytesIO]
+    subclassregs = ['io.TextIOBase', 'io.TextIOWrapper', 'io.StringIO',
+                    'io.BytesIO', '_pyio.TextIOBase', '_pyio.TextIOWrapper',
+                    '_pyio.StringIO', '_pyio.BytesIO']
 
     @abstractproperty
     def mode(self) -> str:
@@ -61,3 +58,84 @@ class IOStream(InputStream, OutputStream):
 
 class SeekableIOStrean(SeekableInputStream, SeekableOutputStream):
     pass
+
+
+class ReadIntoStream(metaclass=HookedMetaClass):
+    """ Binary input that can fill a preallocated buffer.
+    Declared beside InputStream rather than under it, so that it does not
+    inherit the text stream registrations of IOBase """
+    subclasshooks = ['close', 'read', 'readinto']
+    subclassregs = ['io.BufferedReader']
+
+    @abstractmethod
+    def read(self, size=-1) -> bytes:
+        pass
+
+    @abstractmethod
+    def readinto(self, b) -> int:
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+class ReadInto1Stream(ReadIntoStream):
+    """ Buffered binary input that can fill a buffer with at most one raw read
+    """
+    subclasshooks = ['readinto1']
+
+    @abstractmethod
+    def readinto1(self, b) -> int:
+        pass
+
+
+class MemoryviewStream(metaclass=HookedMetaClass):
+    """ Binary sink that accepts any bytes-like object, e.g. a memoryview
+    slice, without copying it first """
+    subclasshooks = ['close', 'write', 'getbuffer']
+    subclassregs = ['io.BufferedWriter', 'io.BufferedRandom', 'io.FileIO',
+                    'mmap.mmap']
+
+    @abstractmethod
+    def write(self, b) -> int:
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+# register would check, and so import, every lazy registration right away
+InputStream.register_lazy(__name__ + ':ReadIntoStream')
+OutputStream.register_lazy(__name__ + ':MemoryviewStream')
+
+
+class AsyncInputStream(metaclass=HookedMetaClass):
+    """ Input whose read is a coroutine, like asyncio.StreamReader """
+    coroutinehooks = ['read']
+    subclassregs = ['asyncio.StreamReader']
+
+    @abstractmethod
+    async def read(self, n=-1) -> Union[bytes, str]:
+        pass
+
+
+class AsyncOutputStream(metaclass=HookedMetaClass):
+    """ Output that buffers write and flushes in a drain coroutine, like
+    asyncio.StreamWriter """
+    subclasshooks = ['write']
+    coroutinehooks = ['drain']
+    subclassregs = ['asyncio.StreamWriter']
+
+    @abstractmethod
+    def write(self, data):
+        pass
+
+    @abstractmethod
+    async def drain(self):
+        pass
+
+
+class AsyncIOStream(AsyncInputStream, AsyncOutputStream):
+    pass
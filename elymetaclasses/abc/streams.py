@@ -0,0 +1,202 @@
+"""
+Helpers for objects satisfying the stream ABCs in elymetaclasses.abc.io
+"""
+import asyncio
+
+from .io import (InputStream, OutputStream, ReadIntoStream,
+                 MemoryviewStream, AsyncInputStream, AsyncOutputStream)
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def iter_chunks(stream: InputStream, size=DEFAULT_CHUNK_SIZE,
+                reuse_buffer=False):
+    """
+    Yield chunks of at most size until the stream is exhausted.
+    A ReadIntoStream is read into one preallocated buffer. With reuse_buffer
+    the chunks are memoryviews of that buffer, valid only until the next one
+    is requested, and no chunk is allocated at all.
+    """
+    if isinstance(stream, ReadIntoStream):
+        view = memoryview(bytearray(size))
+        readinto = stream.readinto
+        while True:
+            n = readinto(view)
+            if not n:
+                return
+            yield view[:n] if reuse_buffer else view[:n].tobytes()
+    else:
+        read = stream.read
+        while True:
+            chunk = read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_split(stream: InputStream, delimiter=None, size=DEFAULT_CHUNK_SIZE,
+               keepends=False):
+    """
+    Yield the records of stream separated by delimiter, newline by default.
+    Records are joined once from the chunks they span, so long records cost
+    linear time however many chunks they cover.
+    """
+    parts = list()
+    tail = empty = None
+    for chunk in iter_chunks(stream, size):
+        if empty is None:
+            empty = chunk[:0]
+            if delimiter is None:
+                delimiter = '\n' if isinstance(chunk, str) else b'\n'
+            end = delimiter if keepends else empty
+            overlap = len(delimiter) - 1
+            tail = empty
+
+        pos = 0
+        split = False
+        if tail:
+            # delimiter may start in the previous chunk
+            i = (tail + chunk[:overlap]).find(delimiter)
+            if i != -1:
+                record = empty.join(parts)
+                yield record[:len(record) - len(tail) + i] + end
+                parts = list()
+                pos = i + len(delimiter) - len(tail)
+                split = True
+
+        i = chunk.find(delimiter, pos)
+        while i != -1:
+            parts.append(chunk[pos:i])
+            yield empty.join(parts) + end
+            parts = list()
+            pos = i + len(delimiter)
+            split = True
+            i = chunk.find(delimiter, pos)
+
+        rest = chunk[pos:]
+        if rest:
+            parts.append(rest)
+        if overlap:
+            tail = (rest if split else tail + rest)[-overlap:]
+
+    if parts:
+        yield empty.join(parts)
+
+
+def _write_all(sink, chunk):
+    n = sink.write(chunk)
+    while n is not None and n < len(chunk):
+        chunk = chunk[n:]
+        n = sink.write(chunk)
+
+
+def tee(stream: InputStream, *sinks: OutputStream, size=DEFAULT_CHUNK_SIZE):
+    """
+    Copy stream into every sink. When the stream is a ReadIntoStream and all
+    sinks are MemoryviewStreams each chunk is written straight from one
+    reused buffer.
+    :return: number of items copied
+    """
+    zero_copy = isinstance(stream, ReadIntoStream) and \
+        all(isinstance(sink, MemoryviewStream) for sink in sinks)
+
+    total = 0
+    for chunk in iter_chunks(stream, size, reuse_buffer=zero_copy):
+        for sink in sinks:
+            _write_all(sink, chunk)
+        total += len(chunk)
+    return total
+
+
+class ThreadedAsyncInput:
+    """ AsyncInputStream over a blocking InputStream. Reads run in executor,
+    the default executor of the running loop if None """
+    def __init__(self, stream: InputStream, executor=None):
+        self.stream = stream
+        self.executor = executor
+
+    def _offload(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func,
+                                                          *args)
+
+    async def read(self, n=-1):
+        return await self._offload(self.stream.read, n)
+
+    async def readline(self):
+        return await self._offload(self.stream.readline)
+
+    def close(self):
+        self.stream.close()
+
+
+class ThreadedAsyncOutput:
+    """ AsyncOutputStream over a blocking OutputStream. write buffers, drain
+    writes the buffer in executor """
+    def __init__(self, stream: OutputStream, executor=None):
+        self.stream = stream
+        self.executor = executor
+        self._buffer = list()
+        self._drained = None
+
+    def _offload(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func,
+                                                          *args)
+
+    def _write_all(self, chunks):
+        for chunk in chunks:
+            self.stream.write(chunk)
+        flush = getattr(self.stream, 'flush', None)
+        if flush is not None:
+            flush()
+
+    def write(self, data):
+        self._buffer.append(data)
+
+    async def drain(self):
+        # chain onto the previous drain so concurrent drains keep write order
+        previous = self._drained
+        chunks, self._buffer = self._buffer, list()
+        drained = self._drained = asyncio.ensure_future(
+            self._drain(previous, chunks))
+        await drained
+
+    async def _drain(self, previous, chunks):
+        if previous is not None:
+            await asyncio.shield(previous)
+        if chunks:
+            await self._offload(self._write_all, chunks)
+
+    def close(self):
+        self.stream.close()
+
+    async def wait_closed(self):
+        pass
+
+
+class ThreadedAsyncIO(ThreadedAsyncInput, ThreadedAsyncOutput):
+    """ AsyncIOStream over a blocking IOStream """
+    def __init__(self, stream, executor=None):
+        ThreadedAsyncOutput.__init__(self, stream, executor)
+
+
+def to_async(stream, executor=None):
+    """
+    Wrap a blocking stream so that its reads and writes run in executor.
+    Streams that are already asynchronous are returned as is
+    :param stream: InputStream, OutputStream or both
+    :param executor: concurrent.futures executor, default of the loop if None
+    :return: AsyncInputStream, AsyncOutputStream or AsyncIOStream
+    """
+    if isinstance(stream, (AsyncInputStream, AsyncOutputStream)):
+        return stream
+
+    readable = isinstance(stream, InputStream)
+    writable = isinstance(stream, OutputStream)
+    if readable and writable:
+        return ThreadedAsyncIO(stream, executor)
+    if readable:
+        return ThreadedAsyncInput(stream, executor)
+    if writable:
+        return ThreadedAsyncOutput(stream, executor)
+    raise TypeError('{!r} is neither an InputStream nor an OutputStream'
+                    .format(stream))
@@ -1,13 +1,30 @@
 __author__ = 'emil'
-from collections import UserDict, OrderedDict, Sequence, deque
+from abc import ABCMeta, get_cache_token
+from collections import (UserDict, OrderedDict, Sequence, defaultdict, deque,
+                         namedtuple)
 import inspect
+import sys
+from contextlib import contextmanager
 from functools import wraps
+from itertools import repeat
+from math import log, log1p
+from random import random
+from time import perf_counter
+import warnings
+from weakref import WeakKeyDictionary
+
+from .abc.base import HookedMetaClass
 
 
 class NoValidAnnotation(TypeError):
     pass
 
 
+class TypeAssertWarning(RuntimeWarning):
+    """ An argument of the wrong type caught by a sampled type_assert """
+    pass
+
+
 class SingleDispatchMethodTree(OrderedDict):
     def __init__(self, default=None, fun_type='method', **kwargs):
         self.func = None
@@ -25,13 +42,25 @@ class SingleDispatchMethodTree(OrderedDict):
             count += 1
         return count
 
-    def __setitem__(self, annotations: Sequence, func):
+    def overloads(self):
+        """
+        yield (annotations, func) for every function in the tree, in the
+        order they were added
+        """
+        if self.func is not None:
+            yield tuple(), self.func
+        for annotation, sub_dict in self.items():
+            for annotations, func in sub_dict.overloads():
+                yield (annotation,) + annotations, func
+
+    def __setitem__(self, annotations: tuple, func):
         if annotations:                                 # Still more annotations to put into tree
-            annotations = deque(annotations)
-            annotation = annotations.popleft()          # take leftmost annotation out
-            item = self.get(annotation, self.__class__())
-            item[annotations] = func                    # assign remaining annotations to new dict with func
-            super().__setitem__(annotation, item)
+            annotation = annotations[0]                 # take leftmost annotation out
+            item = self.get(annotation)
+            if item is None:
+                item = self.__class__()
+                super().__setitem__(annotation, item)
+            item[annotations[1:]] = func                # assign remaining annotations to new dict with func
 
         else:
             self.func = func
@@ -55,9 +84,152 @@ class SingleDispatchMethodTree(OrderedDict):
             return super().__getitem__(inspect._empty)[args]
         raise NoValidAnnotation()
 
+def match_ranks(annotations, args):
+    """
+    Rank how specifically each argument matches its annotation, the position
+    of the annotation in the mro of the argument type. Virtual base classes
+    rank after the mro, and missing annotations after those. Annotations with
+    a __dispatch_rank__ attribute rank by that when they match.
+    :return: tuple of ranks, None if an argument does not match
+    """
+    if len(annotations) < len(args):
+        return None
+
+    ranks = list()
+    for annotation, arg in zip(annotations, args):
+        mro = type(arg).__mro__
+        if annotation is inspect._empty:
+            ranks.append(len(mro) + 1)
+        elif annotation in mro:
+            ranks.append(mro.index(annotation))
+        elif isinstance(arg, annotation):
+            ranks.append(getattr(annotation, '__dispatch_rank__', len(mro)))
+        else:
+            return None
+    return tuple(ranks)
+
+
+def dispatch_key_hooks(overloads) -> tuple:
+    """
+    The distinct __dispatch_key__ functions of the annotations in overloads.
+    Annotations that tell apart instances of the same type, say arrays by
+    dtype, provide one mapping an argument to a hashable refinement of its
+    type, so that resolutions cached by type stay correct.
+    :param overloads: sequence of (annotations, func)
+    """
+    hooks = list()
+    for annotations, _ in overloads:
+        for annotation in annotations:
+            hook = getattr(annotation, '__dispatch_key__', None)
+            if hook is not None and hook not in hooks:
+                hooks.append(hook)
+    return tuple(hooks)
+
+
+def most_specific(overloads, args):
+    """
+    Pick the overload whose annotations match args most specifically: one
+    that is at least as specific as every other match in all arguments, or
+    else the one with the lowest total rank. Ties go to the earliest.
+    :param overloads: sequence of (annotations, func)
+    :return: func, None if nothing matches
+    """
+    candidates = list()
+    for annotations, func in overloads:
+        ranks = match_ranks(annotations, args)
+        if ranks is not None:
+            candidates.append((ranks, func))
+
+    if not candidates:
+        return None
+
+    for ranks, func in candidates:
+        if all(all(r <= o for r, o in zip(ranks, other))
+               for other, _ in candidates):
+            return func
+    return min(candidates, key=lambda candidate: sum(candidate[0]))[1]
+
+
+Param = namedtuple('Param', 'name kind default')
+
+# code object -> ((name, kind), ...) in signature order
+_code_layouts = WeakKeyDictionary()
+
+
+def code_layout(code):
+    """ names and kinds of the parameters of a code object, memoized """
+    try:
+        return _code_layouts[code]
+    except KeyError:
+        pass
+
+    kind = inspect.Parameter
+    names = code.co_varnames
+    # positional-only parameters are new in python 3.8
+    n_posonly = getattr(code, 'co_posonlyargcount', 0)
+    n_pos = code.co_argcount
+    n_kwonly = code.co_kwonlyargcount
+
+    layout = [(name, kind.POSITIONAL_ONLY) for name in names[:n_posonly]]
+    layout.extend((name, kind.POSITIONAL_OR_KEYWORD)
+                  for name in names[n_posonly:n_pos])
+    i = n_pos + n_kwonly
+    if code.co_flags & inspect.CO_VARARGS:
+        layout.append((names[i], kind.VAR_POSITIONAL))
+        i += 1
+    layout.extend((name, kind.KEYWORD_ONLY)
+                  for name in names[n_pos:n_pos + n_kwonly])
+    if code.co_flags & inspect.CO_VARKEYWORDS:
+        layout.append((names[i], kind.VAR_KEYWORD))
+
+    layout = _code_layouts[code] = tuple(layout)
+    return layout
+
+
+def _is_plain_function(func):
+    # functools.wraps and friends make inspect.signature follow __wrapped__
+    return inspect.isfunction(func) and not hasattr(func, '__wrapped__')
+
+
+def get_parameters(func):
+    """
+    Like inspect.signature(func).parameters.values(), but read straight from
+    __code__ for plain functions
+    :return: tuple of Param(name, kind, default)
+    """
+    if not _is_plain_function(func):
+        return tuple(Param(param.name, param.kind, param.default)
+                     for param in inspect.signature(func).parameters.values())
+
+    empty = inspect._empty
+    layout = code_layout(func.__code__)
+    defaults = func.__defaults__ or tuple()
+    kwdefaults = func.__kwdefaults__ or dict()
+    first_default = func.__code__.co_argcount - len(defaults)
+
+    params = list()
+    for i, (name, kind) in enumerate(layout):
+        if kind is inspect.Parameter.KEYWORD_ONLY:
+            default = kwdefaults.get(name, empty)
+        elif kind is inspect.Parameter.VAR_POSITIONAL or \
+                kind is inspect.Parameter.VAR_KEYWORD or i < first_default:
+            default = empty
+        else:
+            default = defaults[i - first_default]
+        params.append(Param(name, kind, default))
+    return tuple(params)
+
+
 def get_annotations(func):
-    sig = inspect.signature(func)
-    return tuple(param.annotation for par_name, param in sig.parameters.items())
+    if not _is_plain_function(func):
+        sig = inspect.signature(func)
+        return tuple(param.annotation
+                     for par_name, param in sig.parameters.items())
+
+    annotations = func.__annotations__
+    empty = inspect._empty
+    return tuple(annotations.get(name, empty)
+                 for name, _ in code_layout(func.__code__))
 
 
 class SingleDispatchClassDict(UserDict):
@@ -90,22 +262,218 @@ class SingleDispatchClassDict(UserDict):
             self.non_funcs[func_name] = func
 
 
-def single_dispatch_func(func_trees):
+def vectorized(func):
+    """
+    Mark an overload as accepting a whole batch when called through the map
+    method of a dispatched function. It is then called once per group of
+    items matching it, with a list per argument, and must return a sequence
+    with one result per item. Methods get the instance (or class) as is;
+    items are grouped by it. Direct calls pass single arguments as usual.
+    """
+    func.__dispatch_vectorized__ = True
+    return func
+
+
+def dispatch_batch(resolve, arg_tuples, n_scalars=None, key=None):
+    """
+    Call the overloads chosen by resolve for each tuple of positional
+    arguments. Overloads are resolved once per distinct tuple of argument
+    types, or of key(args) if given. If n_scalars is given, vectorized
+    overloads are called once per group, with the first n_scalars arguments
+    grouped by identity.
+    :return: list of results in the order of arg_tuples
+    """
+    arg_tuples = [tuple(args) for args in arg_tuples]
+    groups = OrderedDict()
+    for i, args in enumerate(arg_tuples):
+        key_ = tuple(map(type, args)) if key is None else key(args)
+        try:
+            groups[key_].append(i)
+        except KeyError:
+            groups[key_] = [i]
+        except TypeError:
+            # unhashable keys are resolved on their own
+            groups[object()] = [i]
+
+    results = [None] * len(arg_tuples)
+    for idx in groups.values():
+        func = resolve(arg_tuples[idx[0]])
+        if n_scalars is None or \
+                not getattr(func, '__dispatch_vectorized__', False):
+            for i in idx:
+                results[i] = func(*arg_tuples[i])
+            continue
+
+        subgroups = OrderedDict()
+        for i in idx:
+            scalars = arg_tuples[i][:n_scalars]
+            key = tuple(map(id, scalars))
+            if key not in subgroups:
+                subgroups[key] = (scalars, [])
+            subgroups[key][1].append(i)
+
+        for scalars, sub_idx in subgroups.values():
+            columns = [list(column) for column in
+                       zip(*(arg_tuples[i][n_scalars:] for i in sub_idx))]
+            for i, result in zip(sub_idx, func(*scalars, *columns)):
+                results[i] = result
+    return results
+
+
+def single_dispatch_func(func_trees, mode='first'):
+    """
+    Make a function dispatching to the functions in func_trees.
+
+    mode 'first' calls the first function, in declaration order, whose
+    annotations all match. mode 'specific' calls the most specific match,
+    see most_specific, and caches the choice per tuple of argument types,
+    refined by any dispatch_key_hooks.
+    """
     default_func = func_trees[0].default
     fun_type = func_trees[0].fun_type
+    hooks = tuple()
 
-    @wraps(default_func)
-    def wrapped_func(*args, **kwargs):
+    def overloads():
         for func_tree in func_trees:
+            yield from func_tree.overloads()
+
+    def dispatch_key(args):
+        if not hooks:
+            return tuple(map(type, args))
+        return tuple((type(arg),) + tuple(hook(arg) for hook in hooks)
+                     for arg in args)
+
+    if mode == 'first':
+        @wraps(default_func)
+        def wrapped_func(*args, **kwargs):
+            for func_tree in func_trees:
+                try:
+                    func = func_tree[args]
+                    break
+                except NoValidAnnotation:
+                    pass
+            else:
+                func = default_func
+
+            return func(*args, **kwargs)
+
+        def resolve(args):
+            for func_tree in func_trees:
+                try:
+                    return func_tree[args]
+                except NoValidAnnotation:
+                    pass
+            return default_func
+
+        def resolve_info(args):
+            """ (func, None as nothing is cached, whether nothing matched) """
+            for func_tree in func_trees:
+                try:
+                    return func_tree[args], None, False
+                except NoValidAnnotation:
+                    pass
+            return default_func, None, True
+
+        def cache_clear():
+            """ Pick up the dispatch_key_hooks of added overloads """
+            nonlocal hooks
+            hooks = dispatch_key_hooks(overloads())
+
+        cache_clear()
+
+    elif mode == 'specific':
+        table = dict()
+        # keys of table that matched no overload
+        unmatched = set()
+        cache_token = None
+        has_abcs = False
+
+        def resolve_uncached(args):
+            func = most_specific(overloads(), args)
+            return default_func if func is None else func
+
+        def resolve_miss(key, args):
+            func = most_specific(overloads(), args)
+            if func is None:
+                func = default_func
+                unmatched.add(key)
+            table[key] = func
+            return func
+
+        @wraps(default_func)
+        def wrapped_func(*args, **kwargs):
+            if has_abcs and cache_token != get_cache_token():
+                cache_clear()
+            key = dispatch_key(args) if hooks else tuple(map(type, args))
             try:
-                func = func_tree[args]
-                break
-            except NoValidAnnotation:
-                pass
-        else:
-            func = default_func
+                func = table[key]
+            except KeyError:
+                func = resolve_miss(key, args)
+            except TypeError:
+                # unhashable key, e.g. from a hook, is not cached
+                func = resolve_uncached(args)
+            return func(*args, **kwargs)
+
+        def resolve(args):
+            if has_abcs and cache_token != get_cache_token():
+                cache_clear()
+            key = dispatch_key(args)
+            try:
+                return table[key]
+            except KeyError:
+                return resolve_miss(key, args)
+            except TypeError:
+                return resolve_uncached(args)
+
+        def resolve_info(args):
+            """ (func, whether it was cached, whether nothing matched) """
+            if has_abcs and cache_token != get_cache_token():
+                cache_clear()
+            key = dispatch_key(args)
+            try:
+                return table[key], True, key in unmatched
+            except KeyError:
+                func = resolve_miss(key, args)
+                return func, False, key in unmatched
+            except TypeError:
+                func = most_specific(overloads(), args)
+                if func is None:
+                    return default_func, False, True
+                return func, False, False
+
+        def cache_clear():
+            """ Forget the resolved overloads """
+            nonlocal cache_token, has_abcs, hooks
+            table.clear()
+            unmatched.clear()
+            hooks = dispatch_key_hooks(overloads())
+            cache_token = get_cache_token()
+            # isinstance checks against ABCs change when classes are registered
+            has_abcs = any(isinstance(annotation, ABCMeta)
+                           for annotations, _ in overloads()
+                           for annotation in annotations)
+
+        cache_clear()
+        # structural checks of hooked annotations change without a new token
+        HookedMetaClass.on_invalidate(cache_clear)
+    else:
+        raise ValueError('unknown dispatch mode {!r}'.format(mode))
+
+    n_scalars = 0 if fun_type in ('static', 'function') else 1
+
+    def dispatch_map(arg_tuples):
+        """ Like itertools.starmap, but resolves the overload once per
+        distinct tuple of argument types and calls vectorized overloads once
+        per group. Arguments of methods include the instance. Returns a list
+        """
+        return dispatch_batch(resolve, arg_tuples, n_scalars, dispatch_key)
+
+    wrapped_func.resolve = resolve
+    wrapped_func.resolve_info = resolve_info
+    wrapped_func.map = dispatch_map
+    wrapped_func.cache_clear = cache_clear
+    wrapped_func.func_tree = func_trees
 
-        return func(*args, **kwargs)
     if fun_type == 'static':
         wrapped_func = staticmethod(wrapped_func)
     elif fun_type == 'class':
@@ -115,7 +483,207 @@ def single_dispatch_func(func_trees):
     return wrapped_func
 
 
+class DispatchStats:
+    """ Counters of a profiled dispatched function, see profile_dispatch """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        # overload -> calls that matched it
+        self.hits = defaultdict(int)
+        # calls that matched no overload and went to the default function
+        self.fallbacks = 0
+        # resolutions not found in the cache of 'specific' mode
+        self.misses = 0
+        self.resolve_time = 0.
+        self.call_time = 0.
+
+    def as_dict(self) -> dict:
+        return dict(calls=self.calls, fallbacks=self.fallbacks,
+                    misses=self.misses, resolve_time=self.resolve_time,
+                    call_time=self.call_time,
+                    hits={'{}{}'.format(func.__qualname__,
+                                        inspect.signature(func)): count
+                          for func, count in self.hits.items()})
+
+
+# __dispatch_unprofiled__ of functions profiled where they were inherited
+_inherited = object()
+
+
+def _dispatched(owner, name):
+    """ The attribute name of owner, found like getattr but without binding,
+    and the dispatched function it holds """
+    try:
+        attr = inspect.getattr_static(owner, name)
+    except AttributeError:
+        raise AttributeError('{!r} has no attribute {!r}'.format(
+            owner, name)) from None
+    func = getattr(attr, '__func__', attr)
+    if not hasattr(func, 'resolve_info'):
+        raise TypeError('{!r} of {!r} is not a dispatched function'.format(
+            name, owner))
+    return attr, func
+
+
+def _overriding(owner, name) -> list:
+    """ Subclasses of owner, at any depth, that define name themselves """
+    if not isinstance(owner, type):
+        return []
+    found = list()
+    seen = set()
+    queue = type.__subclasses__(owner)
+    while queue:
+        cls = queue.pop()
+        if cls in seen:
+            continue
+        seen.add(cls)
+        if name in cls.__dict__:
+            found.append(cls)
+        queue.extend(type.__subclasses__(cls))
+    return found
+
+
+def _install_profiled(owner, name, attr, func, stats: DispatchStats):
+    resolve_info = func.resolve_info
+
+    @wraps(func)
+    def profiled(*args, **kwargs):
+        start = perf_counter()
+        overload, cached, fallback = resolve_info(args)
+        resolved = perf_counter()
+        try:
+            return overload(*args, **kwargs)
+        finally:
+            stats.call_time += perf_counter() - resolved
+            stats.resolve_time += resolved - start
+            stats.calls += 1
+            if fallback:
+                stats.fallbacks += 1
+            else:
+                stats.hits[overload] += 1
+            stats.misses += cached is False
+
+    profiled.dispatch_stats = stats
+    profiled.__dispatch_unprofiled__ = attr if name in vars(owner) \
+        else _inherited
+    if hasattr(attr, '__func__'):
+        profiled = type(attr)(profiled)
+    setattr(owner, name, profiled)
+
+
+def profile_dispatch(owner, name) -> DispatchStats:
+    """
+    Replace the dispatched function name of owner, a class or module, by one
+    that counts the overloads it calls, calls matching no overload, which
+    fall back to the default, and cache misses, and times resolution and
+    calls. Inherited methods are profiled
+    on owner, and subclasses overriding the method are profiled with it.
+    Nothing is measured, or slowed down, until this is called.
+    :return: the DispatchStats being updated, also kept as the attribute
+        dispatch_stats of the profiled functions
+    """
+    attr, func = _dispatched(owner, name)
+    if hasattr(func, 'dispatch_stats'):
+        return func.dispatch_stats
+
+    stats = DispatchStats()
+    _install_profiled(owner, name, attr, func, stats)
+    for cls in _overriding(owner, name):
+        attr = cls.__dict__[name]
+        func = getattr(attr, '__func__', attr)
+        if hasattr(func, 'resolve_info') and \
+                not hasattr(func, 'dispatch_stats'):
+            _install_profiled(cls, name, attr, func, stats)
+    return stats
+
+
+def unprofile_dispatch(owner, name):
+    """ Undo profile_dispatch """
+    stats = getattr(_dispatched(owner, name)[1], 'dispatch_stats', None)
+    if stats is None:
+        return
+
+    for target in [owner] + _overriding(owner, name):
+        attr = vars(target).get(name)
+        func = getattr(attr, '__func__', attr)
+        if getattr(func, 'dispatch_stats', None) is not stats:
+            continue
+        if func.__dispatch_unprofiled__ is _inherited:
+            delattr(target, name)
+        else:
+            setattr(target, name, func.__dispatch_unprofiled__)
+
+
+@contextmanager
+def profiling_dispatch(owner, *names):
+    """ Profile the dispatched functions names of owner in the body, yields
+    {name: DispatchStats} """
+    stats = {name: profile_dispatch(owner, name) for name in names}
+    try:
+        yield stats
+    finally:
+        for name in names:
+            unprofile_dispatch(owner, name)
+
+
+def dispatch(func=None, mode='first'):
+    """
+    Overload a module-level function by its annotations, like methods of
+    SingleDispatchMetaClass classes. A definition whose name is already bound
+    to a dispatched function of the same qualified name in the namespace it
+    is defined in, e.g. the module or the body of a factory, is added to it.
+    The first definition is the default. Other modules add overloads with the
+    register method:
+
+        @dispatch
+        def area(shape):
+            ...
+
+        @area.register
+        def area_of_circle(shape: Circle):
+            ...
+
+    :param mode: 'first' or 'specific', see single_dispatch_func. Only the
+        first definition decides
+    :return: the dispatched function
+    """
+    def decorator(func, namespace):
+        name = '{}.{}'.format(func.__module__, func.__qualname__)
+        dispatched = namespace.get(func.__name__)
+        if getattr(dispatched, '__dispatch_name__', None) == name:
+            dispatched.register(func)
+            return dispatched
+
+        func_tree = SingleDispatchMethodTree(default=func, fun_type='function')
+        func_tree[get_annotations(func)] = func
+        dispatched = single_dispatch_func([func_tree], mode)
+
+        def register(func):
+            """ Add func as an overload, returns func unchanged """
+            func_tree[get_annotations(func)] = func
+            dispatched.cache_clear()
+            return func
+
+        dispatched.register = register
+        dispatched.__dispatch_name__ = name
+        return dispatched
+
+    # the namespace of the definition is that of the caller of the decorator
+    if func is None:
+        return lambda func: decorator(func, sys._getframe(1).f_locals)
+    return decorator(func, sys._getframe(1).f_locals)
+
+
 class SingleDispatchMetaClass(type):
+    """
+    Overloads methods by their annotations, see README.
+
+    Set dispatch_mode = 'specific' in the class body to call the most
+    specific matching overload instead of the first one declared. The mode
+    is inherited.
+    """
     @classmethod
     def __prepare__(mcs, name, bases):
         return SingleDispatchClassDict()
@@ -125,9 +693,18 @@ class SingleDispatchMetaClass(type):
         new_clsdict = dict()
         new_clsdict.update(clsdict.non_funcs)
 
+        mode = clsdict.non_funcs.get('dispatch_mode')
+        if mode is None:
+            mode = next((base.dispatch_mode for base in bases
+                         if hasattr(base, 'dispatch_mode')), 'first')
+
+        dispatch_bases = [base for base in bases if isinstance(base, mcs)]
+        missing = object()
+
         for func_name, func_tree in clsdict.items():
-            inherited_funcs = [getattr(base, func_name) for base in bases if hasattr(base, func_name) and
-                               issubclass(base.__class__, mcs)]
+            inherited_funcs = [func for func in (getattr(base, func_name, missing)
+                                                 for base in dispatch_bases)
+                               if func is not missing]
             func_trees = [func_tree]
 
             for func in inherited_funcs:
@@ -144,7 +721,7 @@ class SingleDispatchMetaClass(type):
                 new_clsdict[func_name] = func_tree.default
                 continue
 
-            new_clsdict[func_name] = single_dispatch_func(func_trees)
+            new_clsdict[func_name] = single_dispatch_func(func_trees, mode)
 
 
         clsobj = super().__new__(mcs, clsname, bases, new_clsdict)
@@ -160,23 +737,98 @@ class LastResort:
     """
     pass
 
-def type_assert(*annotations):
+def sample_gaps(rate=None, first=None):
+    """
+    Calls until the next check, for the countdown of a sampled type_assert.
+    0 means never again. Rates of 1 or more check every call.
+    """
+    if first is not None:
+        yield from repeat(1, first)
+        yield from repeat(0)
+    if not rate >= 0:
+        raise ValueError('rate must not be negative, not {!r}'.format(rate))
+    if rate == 0:
+        yield from repeat(0)
+    if rate >= 1:
+        yield from repeat(1)
+    # geometric gaps check each call independently with probability rate.
+    # log1p keeps tiny rates from rounding to log(1.) == 0.
+    log_miss = log1p(-rate)
+    while True:
+        yield 1 + int(log(1. - random()) / log_miss)
+
+
+def type_assert(*annotations, rate=None, first=None):
+    """
+    Assert that positional arguments are instances of their annotations.
+
+    With rate or first only a sample of calls is checked, each call with
+    probability rate or the first first calls. Violations are then warned
+    about with TypeAssertWarning and counted in the violations attribute of
+    the wrapped function, as {(argument index, annotation, type): count},
+    instead of raised. Calls left out only decrement a counter.
+    """
     if len(annotations) == 1 and isinstance(annotations[0], (list, tuple)):
         annotations = annotations[0]
 
     def wrapper(func):
+        if rate is None and first is None:
+            @wraps(func)
+            def wrapped(*args, **kwargs):
+                for arg, ann in zip(args, annotations):
+                    if ann != inspect._empty:
+                        assert isinstance(arg, ann)
+                return func(*args, **kwargs)
+            return wrapped
+
+        checked = [(i, ann) for i, ann in enumerate(annotations)
+                   if ann != inspect._empty]
+        gaps = sample_gaps(rate, first)
+        countdown = next(gaps)
+
         @wraps(func)
         def wrapped(*args, **kwargs):
-            for arg, ann in zip(args, annotations):
-                if ann != inspect._empty:
-                    assert isinstance(arg, ann)
-            return func(*args, *kwargs)
+            nonlocal countdown
+            countdown -= 1
+            if countdown:
+                return func(*args, **kwargs)
+
+            countdown = next(gaps)
+            wrapped.checks += 1
+            for i, ann in checked:
+                if i < len(args) and not isinstance(args[i], ann):
+                    wrapped.violations[(i, ann, type(args[i]))] += 1
+                    warnings.warn('{}: argument {} is {}, not {}'.format(
+                        func.__qualname__, i, type(args[i]).__name__,
+                        getattr(ann, '__name__', ann)), TypeAssertWarning,
+                        stacklevel=2)
+            return func(*args, **kwargs)
+
+        wrapped.checks = 0
+        wrapped.violations = defaultdict(int)
         return wrapped
     return wrapper
 
 
 class TypeAssertMetaClass(type):
+    """
+    Asserts the annotated argument types of methods on every call.
+
+    Set type_assert_rate, a fraction of calls, or type_assert_first, a number
+    of calls per method, in the class body to only check a sample of calls
+    and warn about violations instead of raising, see type_assert. The settings are
+    inherited.
+    """
     def __new__(mcs, clsname, bases, clsdict):
+        sampling = dict()
+        for setting in ('rate', 'first'):
+            name = 'type_assert_' + setting
+            if name in clsdict:
+                sampling[setting] = clsdict[name]
+            else:
+                sampling[setting] = next((getattr(base, name) for base in bases
+                                          if hasattr(base, name)), None)
+
         new_clsdict = dict(clsdict)
         for func_name, func in clsdict.items():
             if not inspect.isfunction(func):
@@ -185,7 +837,7 @@ class TypeAssertMetaClass(type):
             if all([an == inspect._empty for an in ann]):
                 new_clsdict[func_name] = func
             else:
-                new_clsdict[func_name] = type_assert(ann)(func)
+                new_clsdict[func_name] = type_assert(ann, **sampling)(func)
 
         clsobj = super().__new__(mcs, clsname, bases, new_clsdict)
         return clsobj
@@ -0,0 +1,137 @@
+"""
+Annotations matching arrays by dtype, ndim and contiguity, for overloading with
+SingleDispatchMetaClass or dispatch:
+
+    class Filter(metaclass=SingleDispatchMetaClass):
+        def apply(self, data: array_of('float32', ndim=2)):
+            ...
+
+        def apply(self, data: array_of('float64', contiguous='C')):
+            ...
+
+Anything with dtype and ndim attributes is an array, so numpy is optional. With
+numpy installed dtypes match by numpy.issubdtype, e.g. array_of(numpy.floating)
+matches every float array, otherwise by name. Matches are cached per spec and
+(type, dtype, ndim).
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_missing = object()
+
+
+def array_key(arg):
+    """ What arrays of the same type must share to match the same specs, None
+    for anything that is not an array """
+    try:
+        dtype = arg.dtype
+        ndim = arg.ndim
+    except AttributeError:
+        return None
+    flags = getattr(arg, 'flags', None)
+    return (dtype, ndim, getattr(flags, 'c_contiguous', None),
+            getattr(flags, 'f_contiguous', None))
+
+
+def dtype_matches(dtype, spec) -> bool:
+    if numpy is not None:
+        try:
+            return bool(numpy.issubdtype(dtype, spec))
+        except TypeError:
+            pass
+    if dtype == spec:
+        return True
+    return getattr(dtype, 'name', str(dtype)) == getattr(spec, 'name', spec)
+
+
+class ArrayMeta(type):
+    def __instancecheck__(cls, instance):
+        try:
+            dtype = instance.dtype
+            ndim = instance.ndim
+        except AttributeError:
+            return False
+
+        matches = cls._matches
+        key = (type(instance), dtype, ndim)
+        try:
+            matched = matches.get(key, _missing)
+        except TypeError:
+            # unhashable dtype
+            key = None
+            matched = _missing
+        if matched is _missing:
+            matched = cls._match(type(instance), dtype, ndim)
+            if key is not None:
+                matches[key] = matched
+
+        if matched and cls.contiguous is not None:
+            flags = getattr(instance, 'flags', None)
+            return bool(getattr(flags, cls.contiguous.lower() + '_contiguous',
+                                False))
+        return matched
+
+    def _match(cls, array_type, dtype, ndim) -> bool:
+        if cls.base is not None and not issubclass(array_type, cls.base):
+            return False
+        if cls.ndim is not None and ndim not in cls.ndim:
+            return False
+        return cls.dtype is None or dtype_matches(dtype, cls.dtype)
+
+    def __repr__(cls):
+        return cls.__name__
+
+
+class Array(metaclass=ArrayMeta):
+    """ Annotation matching anything with dtype and ndim, see array_of """
+    dtype = None
+    ndim = None
+    contiguous = None
+    base = None
+    _matches = dict()
+
+    # hooks for single dispatch. Resolutions are cached by array_key as well
+    # as type, and specs rank as more specific the more they constrain
+    __dispatch_key__ = staticmethod(array_key)
+    __dispatch_rank__ = 0
+
+
+_specs = dict()
+
+
+def array_of(dtype=None, ndim=None, contiguous=None, base=None) -> ArrayMeta:
+    """
+    An annotation matching arrays
+    :param dtype: dtype, its name or with numpy an abstract scalar type
+    :param ndim: an int or a collection of ints
+    :param contiguous: 'C' or 'F'
+    :param base: array class the type must derive from, e.g. numpy.ndarray
+    """
+    if isinstance(ndim, int):
+        ndim = (ndim,)
+    elif ndim is not None:
+        ndim = tuple(sorted(ndim))
+    if contiguous is not None and contiguous.upper() not in ('C', 'F'):
+        raise ValueError("contiguous must be 'C' or 'F', not {!r}".format(
+            contiguous))
+
+    key = (dtype, ndim, contiguous and contiguous.upper(), base)
+    try:
+        return _specs[key]
+    except (KeyError, TypeError):
+        pass
+
+    constraints = [(name, value) for name, value in zip(
+        ('dtype', 'ndim', 'contiguous', 'base'), key) if value is not None]
+    name = 'Array[{}]'.format(', '.join('{}={!r}'.format(*constraint)
+                                        for constraint in constraints))
+    spec = ArrayMeta(name, (Array,), dict(
+        dtype=key[0], ndim=key[1], contiguous=key[2], base=key[3],
+        _matches=dict(), __dispatch_rank__=-len(constraints)))
+    try:
+        _specs[key] = spec
+    except TypeError:
+        pass
+    return spec
@@ -1,8 +1,18 @@
-from collections import (namedtuple, OrderedDict, defaultdict, UserDict)
+from collections import (namedtuple, OrderedDict, defaultdict)
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from copy import copy
 import inspect
-from functools import (lru_cache, partial, wraps)
+import os
+import pickle
+from tempfile import TemporaryFile
+from threading import Lock, RLock
+from weakref import WeakSet, ref
+from functools import (partial, wraps)
+from . import tracing
+from .annotations import Param, get_parameters
 from .utils import Options
-from itertools import chain
+from itertools import chain, product, repeat
 from typing import List, Sequence, Union
 
 GlobalFuncName = namedtuple('GlobalFuncName', 'cls_name func_name')
@@ -14,23 +24,81 @@ class IllegalConstruction(SyntaxError):
     pass
 
 
-class DependencyDict(UserDict):
-    def __init__(self, clsname):
+class StreamInvalidated(RuntimeError):
+    """ Raised when reading a ChunkStream whose property has been invalidated
+    or set since the stream was made """
+    pass
+
+
+class DependencyDict:
+    """ GlobalFuncName view of the integer dependency lists of a ChainedProps
+    class. dependants[slot] holds the slots of properties that read the
+    property in slot.
+
+    The transitive closures of slots and option keys, what to evict when they
+    change, are computed on first use and kept up to date as edges are added
+    through add. Instances on several threads share them, so adding edges and
+    computing closures hold a lock """
+    def __init__(self, clsname, layout=(), slot_of=None, dependants=(),
+                 option_readers=None):
         self.clsname = clsname
-        super().__init__()
-        super().__setitem__(clsname, defaultdict(set))
+        self.layout = layout
+        self.slot_of = slot_of if slot_of is not None else dict()
+        self.dependants = dependants
+        self.option_readers = option_readers if option_readers is not None \
+            else dict()
+        # slot -> frozenset of the slot and everything that depends on it
+        self.closures = dict()
+        # option key -> union of the closures of the slots reading it
+        self.option_closures = dict()
+        self._lock = RLock()
+
+    def add(self, slot: int, dependant: int):
+        """ Record that dependant reads slot """
+        with self._lock:
+            self.dependants[slot].add(dependant)
+            for closures in (self.closures, self.option_closures):
+                grown = [key for key, closure in closures.items()
+                         if slot in closure and dependant not in closure]
+                if grown:
+                    added = self.closure(dependant)
+                    for key in grown:
+                        closures[key] = closures[key] | added
+
+    def closure(self, slot: int) -> frozenset:
+        try:
+            return self.closures[slot]
+        except KeyError:
+            pass
+
+        with self._lock:
+            closure = {slot}
+            closure_q = list(self.dependants[slot])
+            while closure_q:
+                dependant = closure_q.pop()
+                if dependant not in closure:
+                    closure.add(dependant)
+                    closure_q.extend(self.dependants[dependant])
+            closure = self.closures[slot] = frozenset(closure)
+            return closure
+
+    def option_closure(self, key) -> frozenset:
+        try:
+            return self.option_closures[key]
+        except KeyError:
+            pass
 
-    def add_base(self, base: object):
-        if hasattr(base, '_dependencies'):
-            for _base, _dependencies in base._dependencies.super_items():
-                super().__setitem__(_base, _dependencies)
+        with self._lock:
+            closure = frozenset().union(*map(self.closure,
+                                             self.option_readers.get(key, ())))
+            self.option_closures[key] = closure
+            return closure
 
-    def get_func_dict(self):
-        return super().__getitem__(self.clsname)
+    def _slot(self, func_descriptor: GlobalFuncName):
+        return self.slot_of[func_descriptor]
 
-    def super_items(self):
-        for base in self.keys():
-            yield base, super().__getitem__(base)
+    def __contains__(self, func_descriptor: GlobalFuncName):
+        return func_descriptor in self.slot_of
 
     def __setitem__(self, dependency: GlobalFuncName, function: GlobalFuncName):
         """
@@ -40,7 +108,7 @@ class DependencyDict(UserDict):
         :return:
         """
         try:
-            self.__getitem__(dependency).add(function)
+            self.add(self._slot(dependency), self._slot(function))
 
         except KeyError:
             raise KeyError(
@@ -53,54 +121,468 @@ class DependencyDict(UserDict):
         """
         get all functions that depend on "dependency"
         :param dependency:
-        :return: GlobalFuncName instance of a function that requires dependency
+        :return: set of GlobalFuncName of the functions that require dependency
         """
-        return super().__getitem__(dependency.cls_name)[dependency.func_name]
+        return set(self.layout[slot]
+                   for slot in self.dependants[self._slot(dependency)])
 
 
-def args_from_opt(*non_opt_args: Sequence):
+def args_from_opt(*non_opt_args: Sequence, memoize: Union[bool, int]=False):
     """A decorator indicating a method which should take some or all of its
     input from self.opt: Options
 
+    With memoize=n, or True for 128, an instance remembers the results of its
+    last n calls by their explicit arguments. The memo is dropped when an
+    option the method reads changes, like the cache of a chained property.
+
     Requires that the metaclass is ChainedPropsMetaClass or derived from it.
     """
     def tagger(funcobj):
         funcobj.__args_from_opt__ = non_opt_args
+        funcobj.__args_from_opt_memoize__ = 128 if memoize is True else memoize
         return funcobj
     return tagger
 
 
+def stale_while_revalidate(funcobj):
+    """A decorator for the getter of a chained property whose value should be
+    kept as stale when invalidated. Readers get the stale value while the
+    property is recomputed in the background, on the executor given by the
+    class attribute revalidate_executor or a shared thread pool.
+
+        @property
+        @stale_while_revalidate
+        def prop(self, key):
+            ...
+
+    Requires that the metaclass is ChainedPropsMetaClass or derived from it.
+    """
+    funcobj.__stale_while_revalidate__ = True
+    return funcobj
+
+
+def streaming(funcobj=None, *, spill_after: int=None):
+    """A decorator for the getter of a chained property that yields its value
+    in chunks. The property is a ChunkStream that dependants iterate while it
+    is produced, and which replays the chunks on later reads. Chunks past the
+    first spill_after are pickled to a temporary file instead of kept in
+    memory, with None for no limit.
+
+        @property
+        @streaming(spill_after=100)
+        def rows(self, path):
+            yield from read_rows(path)
+
+    Invalidating the property stops the producer, and iterating the stream
+    raises StreamInvalidated after that.
+
+    Requires that the metaclass is ChainedPropsMetaClass or derived from it.
+    """
+    def tagger(funcobj):
+        funcobj.__streaming_spill_after__ = spill_after
+        return funcobj
+
+    if funcobj is None:
+        return tagger
+    return tagger(funcobj)
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def default_executor() -> Executor:
+    """ The thread pool shared by classes with no revalidate_executor """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix='revalidate')
+        return _executor
+
+
+# marks an empty entry in the property value list
+_missing = object()
+
+# separates positional from keyword arguments in memo keys
+_kwargs_mark = object()
+
+
+class ChunkStream:
+    """
+    The value of a streaming chained property. Iterating it yields the chunks
+    produced so far and then pulls new ones from the producer, so any number
+    of readers share one production. The property's slot is on the property
+    stack while the producer runs, so properties it reads register it as a
+    dependant. Once the slot of the property no longer holds the stream the
+    producer is closed and reads raise StreamInvalidated.
+    """
+    def __init__(self, instance: '_ChainedProps', slot: int, chunks,
+                 spill_after: int=None):
+        self._instance = ref(instance)
+        self._slot = slot
+        self._chunks = iter(chunks)
+        self._spill_after = spill_after
+        self._memory = list()
+        # offsets of the chunks pickled to _file, after those in _memory
+        self._offsets = list()
+        self._file = None
+        self._invalid = False
+        self._producing = False
+        self._lock = RLock()
+
+    def __iter__(self):
+        i = 0
+        while True:
+            chunk = self._chunk(i)
+            if chunk is _missing:
+                return
+            yield chunk
+            i += 1
+
+    def __len__(self):
+        """ Chunks produced so far """
+        return len(self._memory) + len(self._offsets)
+
+    @property
+    def done(self) -> bool:
+        """ whether the producer is finished, or closed """
+        return self._chunks is None
+
+    def _chunk(self, i: int):
+        with self._lock:
+            self._check()
+            if i < len(self):
+                return self._cached(i)
+            if self._chunks is None:
+                return _missing
+
+            instance = self._instance()
+            stack = instance._property_stack
+            stack.append(self._slot)
+            self._producing = True
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                chunk = _missing
+            except Exception:
+                # the next read of the property starts over
+                self._producing = False
+                self.close()
+                if instance._property_values[self._slot] is self:
+                    instance._slot_cache_delete(self._slot)
+                raise
+            finally:
+                self._producing = False
+                stack.pop()
+
+            if self._invalid:
+                # invalidated while the producer ran, see close
+                self._check()
+            if chunk is _missing:
+                self._chunks = None
+                return _missing
+            self._store(chunk)
+            return chunk
+
+    def _check(self):
+        instance = self._instance()
+        if (not self._invalid and instance is not None and
+                instance._property_values[self._slot] is self):
+            return
+        self.close()
+        name = 'stream' if instance is None else repr(
+            instance._slot_layout[self._slot])
+        raise StreamInvalidated(name + ' was invalidated')
+
+    def _cached(self, i: int):
+        if i < len(self._memory):
+            return self._memory[i]
+        self._file.seek(self._offsets[i - len(self._memory)])
+        return pickle.load(self._file)
+
+    def _store(self, chunk):
+        if self._spill_after is None or len(self._memory) < self._spill_after:
+            self._memory.append(chunk)
+            return
+        if self._file is None:
+            self._file = TemporaryFile()
+        self._file.seek(0, os.SEEK_END)
+        self._offsets.append(self._file.tell())
+        pickle.dump(chunk, self._file, pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        """ Stop the producer and drop the cached chunks. A running producer
+        is stopped by the read it runs for, once it yields """
+        self._invalid = True
+        if self._producing:
+            return
+        with self._lock:
+            if self._chunks is not None:
+                close = getattr(self._chunks, 'close', None)
+                self._chunks = None
+                if close is not None:
+                    close()
+            self._memory = list()
+            self._offsets = list()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class OptionsBinding:
+    """
+    The one callback that all ChainedProps instances over an Options share,
+    with a reverse index from option key to the instances holding a cached
+    value computed from it. A write invalidates every instance in the index
+    for its key in one pass and empties it, instances rejoin when they
+    recompute a property reading the key.
+    """
+    __slots__ = ('readers', 'version', '_callback', '__weakref__')
+
+    def __init__(self):
+        self.readers = dict()
+        # bumped by every write, see _ChainedProps._epoch
+        self.version = 0
+        # Options holds callbacks weakly, the binding keeps this one alive
+        self._callback = self.on_change
+
+    @classmethod
+    def of(cls, opt: Options) -> 'OptionsBinding':
+        # Options are unhashable, so the binding lives on the instance
+        try:
+            return opt.__dict__['_chained_binding']
+        except KeyError:
+            binding = opt.__dict__['_chained_binding'] = cls()
+            return binding
+
+    def watch(self, opt: Options, key, instance):
+        try:
+            self.readers[key].add(instance)
+        except KeyError:
+            self.readers[key] = WeakSet((instance,))
+            opt.set_callback(key, self._callback)
+
+    def on_change(self, key, value):
+        self.version += 1
+        instances = self.readers.pop(key, None)
+        if not instances:
+            return
+
+        by_class = defaultdict(list)
+        for instance in instances:
+            by_class[type(instance)].append(instance)
+
+        tracer = tracing.tracer
+        for cls, group in by_class.items():
+            closure = cls._dependencies.option_closure(key)
+            for instance in group:
+                instance._property_epoch += 1
+                if tracer is None:
+                    instance._slot_evict(closure)
+                else:
+                    instance._slot_invalidate_traced(
+                        cls._option_readers.get(key, ()), key, tracer)
+
+
 class _ChainedProps:
-    _dependencies = DependencyDict(
-        '_ChainedProps')  # <- Overwritten by metaclass!
+    """
+    Cached property values live in a list indexed by the slot the metaclass
+    gave each property, unset entries hold _missing.
+
+    Subclasses that declare __slots__ = () have no per-instance __dict__
+    """
+    __slots__ = ('opt', '_property_values', '_property_stack',
+                 '_property_binding', '_property_stale', '_property_pending',
+                 '_property_epoch', '_options_callbacks', '__weakref__')
+
+    revalidate_executor = None
+
+    # Overwritten by metaclass!
+    _slot_layout = tuple()
+    _slot_of = dict()
+    _slot_dependants = tuple()
+    _stale_slots = frozenset()
+    _memo_slots = frozenset()
+    _stream_slots = frozenset()
+    _option_readers = dict()
+    _dependencies = DependencyDict('_ChainedProps')
 
     def __init__(self, opt: Options):
         assert isinstance(opt, Options)
         self.opt = opt
-        self._property_cache = dict()
+        self._property_values = [_missing] * len(self._slot_layout)
         self._property_stack = list()
+        self._property_binding = OptionsBinding.of(opt)
+        # slot -> value for invalidated stale_while_revalidate properties
+        self._property_stale = dict()
+        # slot -> (epoch, future) of background recomputes. Any invalidation
+        # changes the epoch and so discards recomputes started before it
+        self._property_pending = dict()
+        self._property_epoch = 0
+        # prop_name -> callback of options_callback, made on first request
+        self._options_callbacks = None
 
-    @lru_cache()
-    def options_callback(self, prop_name):
-        return partial(self.del_callback, prop_name)
+    def _shadow(self, opt: Options):
+        """ A copy of self over opt, starting from the cached values of self """
+        shadow = copy(self)
+        _ChainedProps.__init__(shadow, opt)
+        shadow._property_values[:] = self._property_values
+        # memo tables are mutated on every call and streams are bound to
+        # self, shadows get their own
+        for slot in self._memo_slots | self._stream_slots:
+            shadow._property_values[slot] = _missing
+        return shadow
 
-    def del_callback(self, prop_name, key, value):
+    def _epoch(self):
+        return self._property_epoch, self._property_binding.version
+
+    def options_callback(self, prop_name: GlobalFuncName):
+        """ Callback for Options.set_callback evicting prop_name. Kept by the
+        instance, as Options holds callbacks weakly """
+        if self._options_callbacks is None:
+            self._options_callbacks = dict()
+        try:
+            return self._options_callbacks[prop_name]
+        except KeyError:
+            callback = partial(self.del_callback, prop_name)
+            self._options_callbacks[prop_name] = callback
+            return callback
+
+    def del_callback(self, prop_name: GlobalFuncName, key, value):
         self._prop_cache_delete(prop_name)
 
-    # noinspection PyProtectedMember
-    def _prop_cache_delete(self, func_descriptor):
-        dependencies = self._dependencies
-        delete_q = {func_descriptor}
-        while delete_q:
-            del_fun = delete_q.pop()
+    def option_changed(self, key, value):
+        """ Evict every property reading the option key """
+        self._property_epoch += 1
+        if tracing.tracer is not None:
+            self._slot_invalidate_traced(self._option_readers.get(key, ()),
+                                         key, tracing.tracer)
+        else:
+            self._slot_evict(self._dependencies.option_closure(key))
+
+    def _prop_cache_delete(self, func_descriptor: GlobalFuncName):
+        self._slot_cache_delete(self._slot_of[func_descriptor])
 
-            # by induction, a property not in the cache would already have
-            # deleted any dependants or not have created any.
-            if del_fun not in self._property_cache:
-                continue
+    def _slot_cache_delete(self, slot: int, origin=None):
+        self._property_epoch += 1
+        self._slot_invalidate((slot,), origin)
 
-            delete_q.update(dependencies[del_fun])
-            self._property_cache.pop(del_fun)
+    def _slot_invalidate(self, slots, origin=None):
+        """ Drop slots and everything that depends on them. origin, an option
+        key or property name, is what invalidated slots, for tracing """
+        if tracing.tracer is not None:
+            return self._slot_invalidate_traced(slots, origin, tracing.tracer)
+
+        closure = self._dependencies.closure
+        for slot in slots:
+            self._slot_evict(closure(slot))
+
+    def _slot_evict(self, slots: frozenset):
+        """ Drop the values in slots, e.g. a closure, in one pass """
+        values = self._property_values
+        stale_slots = self._stale_slots
+        if stale_slots:
+            for slot in stale_slots & slots:
+                if values[slot] is not _missing:
+                    self._property_stale[slot] = values[slot]
+        streams = [values[slot] for slot in self._stream_slots & slots
+                   if isinstance(values[slot], ChunkStream)] \
+            if self._stream_slots else ()
+        for slot in slots:
+            values[slot] = _missing
+        # stop producers and free spilled chunks right away
+        for stream in streams:
+            stream.close()
+
+    def _slot_invalidate_traced(self, slots, origin, tracer):
+        """ _slot_invalidate walking the edges, to record what evicted what """
+        dependants = self._slot_dependants
+        stale_slots = self._stale_slots
+        values = self._property_values
+        layout = self._slot_layout
+        with tracer.caused('invalidate', repr(origin), new=False):
+            # a property deleted or set directly evicts itself
+            delete_q = [(slot, layout[slot] if origin is None else origin)
+                        for slot in slots]
+            seen = set()
+            while delete_q:
+                del_slot, parent = delete_q.pop()
+                if del_slot in seen:
+                    continue
+                seen.add(del_slot)
+
+                value = values[del_slot]
+                if value is not _missing:
+                    if del_slot in stale_slots:
+                        self._property_stale[del_slot] = value
+                    values[del_slot] = _missing
+                    if isinstance(value, ChunkStream):
+                        value.close()
+                    tracer.evicted(self, del_slot, layout[del_slot], parent)
+                delete_q.extend((dependant, layout[del_slot])
+                                for dependant in dependants[del_slot])
+
+    def _slot_cache_set(self, slot: int, prop):
+        self._slot_cache_delete(slot)
+        self._property_stale.pop(slot, None)
+        self._property_values[slot] = prop
+
+    def _revalidate(self, slots: Sequence[int], fgets: Sequence):
+        """ Start recomputing slots in the background, one after the other on
+        a single shadow of self so they share intermediates """
+        executor = self.revalidate_executor or default_executor()
+        shadow = self._shadow(self.opt.snapshot())
+        futures = [Future() for _ in slots]
+
+        def recompute():
+            for future, fget in zip(futures, fgets):
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fget(shadow))
+                    except Exception as e:
+                        future.set_exception(e)
+
+        executor.submit(recompute)
+        for slot, future in zip(slots, futures):
+            self._property_pending[slot] = (self._epoch(), future)
+
+    def _is_pending(self, slot: int):
+        pending = self._property_pending.get(slot)
+        return pending is not None and pending[0] == self._epoch()
+
+    def _take_revalidated(self, slot: int, wait=False):
+        """ Apply the background recompute of slot if it is done, or after
+        waiting for it. Returns the value or _missing """
+        try:
+            epoch, future = self._property_pending[slot]
+        except KeyError:
+            return _missing
+
+        if epoch != self._epoch():
+            # started before an invalidation
+            del self._property_pending[slot]
+            return _missing
+        if not (wait or future.done()):
+            return _missing
+
+        del self._property_pending[slot]
+        try:
+            prop = future.result()
+        except Exception:
+            # readers recompute, and raise, on their own
+            self._property_stale.pop(slot, None)
+            return _missing
+
+        # dependants may have read the stale value
+        self._slot_invalidate(tuple(self._slot_dependants[slot]),
+                              self._slot_layout[slot])
+        self._property_stale.pop(slot, None)
+        self._property_values[slot] = prop
+
+        # computed on a shadow, so watch any key it may have read
+        for key in self._option_readers:
+            self._property_binding.watch(self.opt, key, self)
+        return prop
 
 
 class ChainedPropsMetaClass(type):
@@ -113,11 +595,32 @@ class ChainedPropsMetaClass(type):
     def __new__(mcs, clsname, bases, clsdict):
         debug_flags = clsdict.get('debug', tuple())
         new_clsdict = dict()
-        dependencies = DependencyDict(clsname)
+
+        # the layout of the first base is kept as a prefix, so inherited
+        # getters mostly find their property in the slot they were given
+        layout = list()
+        slot_of = dict()
+        option_readers = defaultdict(set)
+        stale_slots = set()
+        memo_slots = set()
+        stream_slots = set()
         for base in bases:
-            dependencies.add_base(base)
+            for func_name_global in getattr(base, '_slot_layout', ()):
+                if func_name_global not in slot_of:
+                    slot_of[func_name_global] = len(layout)
+                    layout.append(func_name_global)
 
-        new_clsdict['_dependencies'] = dependencies
+            stale_slots.update(slot_of[base._slot_layout[slot]]
+                               for slot in getattr(base, '_stale_slots', ()))
+            memo_slots.update(slot_of[base._slot_layout[slot]]
+                              for slot in getattr(base, '_memo_slots', ()))
+            stream_slots.update(slot_of[base._slot_layout[slot]]
+                                for slot in getattr(base, '_stream_slots', ()))
+
+            for key, slots in getattr(base, '_option_readers', dict()).items():
+                base_layout = base._slot_layout
+                option_readers[key].update(slot_of[base_layout[slot]]
+                                           for slot in slots)
 
         for func_name_local, func in clsdict.items():
             if isinstance(func, property):
@@ -126,11 +629,20 @@ class ChainedPropsMetaClass(type):
                     continue
 
                 func_name_global = GlobalFuncName(clsname, func_name_local)
+                home_slot = slot_of[func_name_global] = len(layout)
+                layout.append(func_name_global)
                 getter = func.fget
-                params = list(inspect.signature(getter).parameters.values())
-                params.pop(0)
-                new_get = partial(mcs.getter, mcs, getter,
-                                  params, func_name_global)
+                params = get_parameters(getter)[1:]
+                for param in params:
+                    option_readers[param.name].add(home_slot)
+                if getattr(getter, '__stale_while_revalidate__', False):
+                    stale_slots.add(home_slot)
+                if hasattr(getter, '__streaming_spill_after__'):
+                    stream_slots.add(home_slot)
+                    getter = mcs.streamed(getter, func_name_global,
+                                          getter.__streaming_spill_after__)
+                new_get = partial(mcs.getter, mcs, getter, params,
+                                  func_name_global, home_slot)
 
                 new_del = partial(mcs.deleter, func_name_global)
                 if func.fset is None:
@@ -151,11 +663,40 @@ class ChainedPropsMetaClass(type):
                                               'class- and staticmethods')
                 non_opt_args = func.__args_from_opt__
                 wrapper = mcs.args_from_opt(non_opt_args)
-                new_clsdict[func_name_local] = wrapper(func)
+                maxsize = getattr(func, '__args_from_opt_memoize__', False)
+                if not maxsize:
+                    new_clsdict[func_name_local] = wrapper(func)
+                    continue
+
+                # the memo table is cached in a slot like a property value
+                func_name_global = GlobalFuncName(clsname, func_name_local)
+                home_slot = slot_of[func_name_global] = len(layout)
+                layout.append(func_name_global)
+                memo_slots.add(home_slot)
+                params = get_parameters(func)[1:]
+                for param in params:
+                    option_readers[param.name].add(home_slot)
+                new_clsdict[func_name_local] = mcs.memoized(
+                    wrapper(func), params, func_name_global, home_slot, maxsize)
 
             else:
                 new_clsdict[func_name_local] = func
 
+        layout = tuple(layout)
+        dependants = tuple(set() for _ in layout)
+        new_clsdict['_slot_layout'] = layout
+        new_clsdict['_slot_of'] = slot_of
+        new_clsdict['_slot_dependants'] = dependants
+        new_clsdict['_stale_slots'] = frozenset(stale_slots)
+        new_clsdict['_memo_slots'] = frozenset(memo_slots)
+        new_clsdict['_stream_slots'] = frozenset(stream_slots)
+        new_clsdict['_option_readers'] = {key: tuple(sorted(slots))
+                                          for key, slots
+                                          in option_readers.items()}
+        new_clsdict['_dependencies'] = DependencyDict(
+            clsname, layout, slot_of, dependants,
+            new_clsdict['_option_readers'])
+
         clsobj = super().__new__(mcs, clsname, bases, new_clsdict)
         return clsobj
 
@@ -167,48 +708,130 @@ class ChainedPropsMetaClass(type):
     def wrapping_setter(func_descriptor: GlobalFuncName, fset,
                         instance: _ChainedProps, prop):
         prop = fset(instance, prop)
-        instance._prop_cache_delete(func_descriptor)
-        instance._property_cache[func_descriptor] = prop
+        instance._slot_cache_set(instance._slot_of[func_descriptor], prop)
 
     @staticmethod
     def basic_setter(func_descriptor: GlobalFuncName,
                      instance: _ChainedProps, prop):
-        instance._prop_cache_delete(func_descriptor)
-        instance._property_cache[func_descriptor] = prop
+        instance._slot_cache_set(instance._slot_of[func_descriptor], prop)
 
     # noinspection PyProtectedMember
     def getter(self, wrapped, params, func_descriptor: GlobalFuncName,
-               instance: _ChainedProps):
+               home_slot: int, instance: _ChainedProps):
 
-        dependencies = instance._dependencies
-        assert isinstance(dependencies, DependencyDict)
+        slot = home_slot
+        if instance._slot_layout[slot] is not func_descriptor:
+            # inherited through a base that is not first in the mro
+            slot = instance._slot_of[func_descriptor]
 
         # if the property stack is non-empty this property has been requested
         # by another property. The immediate dependant property is the last
         # called in the stack
-        if instance._property_stack:
-            dependant = instance._property_stack[-1]
+        stack = instance._property_stack
+        if stack and stack[-1] not in instance._slot_dependants[slot]:
             # add current prop as dependency of dependant
-            dependencies[func_descriptor].add(dependant)
+            instance._dependencies.add(slot, stack[-1])
+
+        values = instance._property_values
+        prop = values[slot]
+        if prop is not _missing:
+            return prop
+
+        stale = instance._property_stale
+        if instance._property_pending:
+            prop = instance._take_revalidated(slot, wait=slot not in stale)
+            if prop is not _missing:
+                return prop
+
+        if slot in stale:
+            if slot not in instance._property_pending:
+                instance._revalidate((slot,), (partial(self.getter, self,
+                                                       wrapped, params,
+                                                       func_descriptor,
+                                                       home_slot),))
+            return stale[slot]
 
-        if func_descriptor in instance._property_cache:
-            return instance._property_cache[func_descriptor]
+        tracer = tracing.tracer
+        if tracer is not None:
+            start = tracer.clock()
 
-        instance._property_stack.append(func_descriptor)
+        stack.append(slot)
         try:
-            args, kwargs = self._fetch_opts(instance, params, func_descriptor)
+            args, kwargs = self._fetch_opts(instance, params,
+                                            instance._property_binding)
             prop = wrapped(instance, *args, **kwargs)
         finally:
-            instance._property_stack.remove(func_descriptor)
+            stack.pop()
 
+        if tracer is not None:
+            tracer.computed(instance, slot, func_descriptor, start)
 
-        instance._property_cache[func_descriptor] = prop
+        values[slot] = prop
         return prop
 
+    @staticmethod
+    def streamed(getter, func_descriptor: GlobalFuncName, spill_after: int):
+        """ getter returning its chunks as a ChunkStream """
+        @wraps(getter)
+        def stream(instance, *args, **kwargs):
+            return ChunkStream(instance, instance._slot_of[func_descriptor],
+                               getter(instance, *args, **kwargs), spill_after)
+        return stream
+
+    @staticmethod
+    def memoized(wrapfun, params, func_descriptor: GlobalFuncName,
+                 home_slot: int, maxsize: int):
+        @wraps(wrapfun)
+        def memo(instance, *args, **kwargs):
+            slot = home_slot
+            if instance._slot_layout[slot] is not func_descriptor:
+                slot = instance._slot_of[func_descriptor]
+
+            # properties calling the method depend on it like on a property
+            stack = instance._property_stack
+            if stack and stack[-1] not in instance._slot_dependants[slot]:
+                instance._dependencies.add(slot, stack[-1])
+
+            values = instance._property_values
+            table = values[slot]
+            if table is _missing:
+                table = values[slot] = OrderedDict()
+                binding = instance._property_binding
+                for param in params:
+                    binding.watch(instance.opt, param.name, instance)
+
+            # the mark keeps positional calls from matching keyword calls
+            key = args + (_kwargs_mark, frozenset(kwargs.items())) \
+                if kwargs else args
+            try:
+                result = table[key]
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable arguments are not memoized
+                return wrapfun(instance, *args, **kwargs)
+            else:
+                table.move_to_end(key)
+                return result
+
+            # properties read by the method are dependencies of the table
+            stack.append(slot)
+            try:
+                result = wrapfun(instance, *args, **kwargs)
+            finally:
+                stack.pop()
+
+            table[key] = result
+            if len(table) > maxsize:
+                table.popitem(last=False)
+            return result
+        return memo
+
     @staticmethod
     def _fetch_opts(instance: _ChainedProps,
-                    parameters: List[inspect.Parameter],
-                    callback_func_name=None, ignore: Sequence[str]=tuple()):
+                    parameters: Sequence[Param],
+                    binding: OptionsBinding=None,
+                    ignore: Sequence[str]=tuple()):
 
         kwargs = OrderedDict()
         args = list()
@@ -235,17 +858,15 @@ class ChainedPropsMetaClass(type):
             elif name in instance.opt:
                 kwargs[name] = instance.opt[name]
 
-            if callback_func_name:
-                instance.opt.set_callback(name,
-                                      instance.options_callback(callback_func_name))
+            if binding is not None:
+                binding.watch(instance.opt, name, instance)
 
         return args, kwargs
 
     @classmethod
     def args_from_opt(mcs, non_opt_args: Sequence):
         def wrapper(func):
-            params = list(inspect.signature(func).parameters.values())
-            params.pop(0)
+            params = get_parameters(func)[1:]
             ignore = tuple()
 
             if len(non_opt_args) == 1 and isinstance(non_opt_args[0], int):
@@ -290,4 +911,150 @@ class ChainedPropsMetaClass(type):
         return wrapper
 
 class ChainedProps(_ChainedProps, metaclass=ChainedPropsMetaClass):
-    pass
+    __slots__ = ()
+
+
+def grid_points(grid) -> List[dict]:
+    """ A mapping of option key -> values is expanded to the cartesian product
+    of the values, anything else is taken as an iterable of overrides """
+    if isinstance(grid, Mapping):
+        keys = list(grid)
+        return [dict(zip(keys, values))
+                for values in product(*(grid[key] for key in keys))]
+    return [dict(point) for point in grid]
+
+
+def sweep(instance: _ChainedProps, target: str, grid, executor=None,
+          chunks: int=None) -> list:
+    """
+    Evaluate the property named target at every point of grid, see grid_points,
+    and return the values in grid order.
+
+    Properties that read none of the swept keys keep their value across all
+    points, starting from what instance has cached. Properties that depend on
+    some but not all swept keys are memoized on the values of those keys.
+    With an executor, e.g. a ProcessPoolExecutor, the points are split into
+    chunks contiguous runs, by default os.cpu_count(), that are spread over
+    its workers. The class of instance must then be picklable.
+
+    instance and its options are left untouched
+    """
+    points = grid_points(grid)
+    cls = type(instance)
+    if executor is None or len(points) < 2:
+        return _sweep_points(instance._shadow(instance.opt.copy()), target,
+                             points)
+
+    n_chunks = chunks or os.cpu_count() or 1
+    size = -(-len(points) // min(n_chunks, len(points)))
+    results = executor.map(_sweep_chunk, repeat(cls), repeat(instance.opt),
+                           repeat(target),
+                           [points[i:i + size]
+                            for i in range(0, len(points), size)])
+    return list(chain.from_iterable(results))
+
+
+def _swept_dependencies(cls, keys) -> dict:
+    """ slot -> sorted tuple of the swept keys it depends on, for slots that
+    depend on some but not all of keys """
+    dependencies = defaultdict(set)
+    for key in keys:
+        for slot in cls._dependencies.option_closure(key):
+            dependencies[slot].add(key)
+
+    return {slot: tuple(sorted(slot_keys))
+            for slot, slot_keys in dependencies.items()
+            if len(slot_keys) < len(keys)}
+
+
+def _n_edges(cls):
+    return sum(map(len, cls._slot_dependants))
+
+
+def _sweep_chunk(cls, opt: Options, target: str, points: List[dict]) -> list:
+    return _sweep_points(cls(opt.copy()), target, points)
+
+
+def _sweep_points(sweeper: _ChainedProps, target: str,
+                  points: List[dict]) -> list:
+    cls = type(sweeper)
+    opt = sweeper.opt
+    values = sweeper._property_values
+
+    keys = set(chain.from_iterable(points))
+    dependencies = _swept_dependencies(cls, keys)
+    n_edges = _n_edges(cls)
+    memo = defaultdict(dict)
+
+    results = list()
+    for point in points:
+        changed = [key for key, value in point.items()
+                   if key not in opt or opt[key] != value]
+        for key in changed:
+            opt[key] = point[key]
+            sweeper.option_changed(key, point[key])
+
+        for slot, slot_keys in dependencies.items():
+            if values[slot] is _missing:
+                memo_key = tuple(opt.get(key, _missing) for key in slot_keys)
+                try:
+                    values[slot] = memo[slot].get(memo_key, _missing)
+                except TypeError:
+                    # unhashable option values are not memoized
+                    pass
+
+        results.append(getattr(sweeper, target))
+
+        # conditional reads may have revealed new edges
+        if _n_edges(cls) != n_edges:
+            dependencies = _swept_dependencies(cls, keys)
+            n_edges = _n_edges(cls)
+
+        for slot, slot_keys in dependencies.items():
+            if values[slot] is not _missing:
+                memo_key = tuple(opt.get(key, _missing) for key in slot_keys)
+                try:
+                    memo[slot].setdefault(memo_key, values[slot])
+                except TypeError:
+                    pass
+    return results
+
+
+def _global_name(cls, name: str) -> GlobalFuncName:
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            return GlobalFuncName(klass.__name__, name)
+    raise AttributeError(name)
+
+
+def prewarm(instance: _ChainedProps, props: Sequence[str], wait=False):
+    """
+    Start recomputing the named properties of instance in the background,
+    e.g. right after changing its options. They are computed in order on one
+    shadow of instance, so shared intermediates are computed once.
+
+    A reader of a prewarmed property waits for the background result, or gets
+    the stale value if the property is stale_while_revalidate. With wait=True
+    prewarm returns once all results are applied to instance.
+    """
+    cls = type(instance)
+    slots = list()
+    cold = OrderedDict()
+    for name in props:
+        try:
+            slot = cls._slot_of[_global_name(cls, name)]
+        except KeyError:
+            raise ValueError('{} is not a cached chained property of {}'.format(
+                name, cls.__name__))
+
+        slots.append(slot)
+        if instance._property_values[slot] is _missing and \
+                not instance._is_pending(slot):
+            cold[slot] = getattr(cls, name).fget
+
+    if cold:
+        instance._revalidate(list(cold), list(cold.values()))
+
+    if wait:
+        for slot in slots:
+            instance._take_revalidated(slot, wait=True)
@@ -0,0 +1,150 @@
+"""
+Opt-in causal tracing of Options changes and the ChainedProps evictions and
+recomputations that follow them.
+
+    with trace() as tracer:
+        opt.key = 1
+        chained.prop
+    tracer.dump('trace.json')
+
+Every Options change that triggers callbacks, and every explicit property
+deletion, opens a cause, recorded as a slice over its handling. Evictions record the edge that evicted them and
+recomputations their duration, both tagged with the id of the cause. Events
+are kept in a bounded ring buffer and export as Chrome trace-event JSON, which
+chrome://tracing and Perfetto open. While no tracer is active the instrumented
+code only checks that the module attribute tracer is None.
+"""
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+from time import perf_counter
+from weakref import WeakKeyDictionary
+
+# the active Tracer, if any
+tracer = None
+
+
+class Tracer:
+    def __init__(self, maxlen=100000):
+        # (ph, cat, name, ts, dur, tid, args) tuples, oldest dropped first
+        self.events = deque(maxlen=maxlen)
+        self._ids = count(1)
+        self._local = threading.local()
+        # instance -> {slot: id of the cause that evicted it}
+        self._evictions = WeakKeyDictionary()
+
+    @staticmethod
+    def clock() -> float:
+        """ microseconds """
+        return perf_counter() * 1e6
+
+    @property
+    def cause(self):
+        """ id of the cause being handled on this thread, or None """
+        return getattr(self._local, 'cause', None)
+
+    def record(self, ph, cat, name, ts, dur=0., **args):
+        self.events.append((ph, cat, name, ts, dur, threading.get_ident(),
+                            args))
+
+    @contextmanager
+    def caused(self, cat, name, new=True, **args):
+        """ Handle the body under a cause. With new=False an enclosing cause
+        is kept if there is one """
+        previous = self.cause
+        if previous is not None and not new:
+            yield previous
+            return
+
+        cause = next(self._ids)
+        start = self.clock()
+        self._local.cause = cause
+        try:
+            yield cause
+        finally:
+            self._local.cause = previous
+            # a slice over the body, which flow arrows can start from
+            self.record('X', cat, name, start, self.clock() - start,
+                        cause=cause, **args)
+
+    def evicted(self, instance, slot: int, name, parent):
+        cause = self.cause
+        try:
+            self._evictions.setdefault(instance, dict())[slot] = cause
+        except TypeError:
+            # not weak referenceable
+            pass
+        self.record('i', 'evict', repr(name), self.clock(), cause=cause,
+                    by=repr(parent))
+
+    def computed(self, instance, slot: int, name, start: float):
+        end = self.clock()
+        try:
+            cause = self._evictions.get(instance, dict()).pop(slot, None)
+        except TypeError:
+            cause = None
+        self.record('X', 'compute', repr(name), start, end - start,
+                    cause=cause)
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = list()
+        for ph, cat, name, ts, dur, tid, args in self.events:
+            event = dict(name=name, cat=cat, ph=ph, ts=ts, pid=pid, tid=tid,
+                         args=args)
+            if ph == 'X':
+                event['dur'] = dur
+            else:
+                event['s'] = 't'
+            events.append(event)
+
+            # flow arrows from each cause to the recomputations it led to
+            cause = args.get('cause')
+            if cause is None:
+                continue
+            if cat in ('option', 'invalidate'):
+                events.append(dict(name='cause', cat='cause', ph='s', id=cause,
+                                   ts=ts, pid=pid, tid=tid))
+            elif cat == 'compute':
+                events.append(dict(name='cause', cat='cause', ph='f', bp='e',
+                                   id=cause, ts=ts, pid=pid, tid=tid))
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def dump(self, target):
+        """ Write the Chrome trace to a path or a text file object """
+        if isinstance(target, (str, bytes, os.PathLike)):
+            with open(target, 'w') as fp:
+                json.dump(self.chrome_trace(), fp, default=repr)
+        else:
+            json.dump(self.chrome_trace(), target, default=repr)
+
+    def clear(self):
+        self.events.clear()
+        self._evictions.clear()
+
+
+def enable(maxlen=100000) -> Tracer:
+    """ Start tracing into a new Tracer and return it """
+    global tracer
+    tracer = Tracer(maxlen)
+    return tracer
+
+
+def disable():
+    global tracer
+    tracer = None
+
+
+@contextmanager
+def trace(maxlen=100000):
+    """ Trace the body, restoring any tracer active before it """
+    global tracer
+    previous = tracer
+    current = enable(maxlen)
+    try:
+        yield current
+    finally:
+        tracer = previous
@@ -1,13 +1,22 @@
 """
 Classes that are not metaclasses
 """
+import asyncio
+import json
+import os
 from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from configparser import ConfigParser
+from contextlib import contextmanager
+from threading import Lock, get_ident
 from weakref import WeakSet
 
 from argparse import ArgumentParser
 from functools import partial
 from itertools import chain
 
+from . import tracing
+
 
 class FailAssert:
     def __init__(self, *fail_types):
@@ -33,8 +42,16 @@ class Options(OrderedDict):
     dictionary members are automatically assigned short and long arguments
 
     callbacks can be assigned to a member such that changes will trigger it.
+    A callback assigned to the key None is triggered by changes to any member.
     NOTE: callbacks are stored as weak references and will disappear if the
     original callback is deleted
+
+    asyncio consumers can use Options.subscribe instead of callbacks, see
+    OptionsSubscription.
+
+    Options pickle as their items and argument specs only. Callbacks are not
+    shipped and the argument parser of an unpickled instance is rebuilt
+    lazily, on first attribute access or parse.
     """
     def __init__(self, *args, **kwargs):
         if '_make_called' not in kwargs:
@@ -44,8 +61,47 @@ class Options(OrderedDict):
         self._short_args = OrderedDict(h='help')
         self._argsparser = ArgumentParser()
         self._on_change_callbacks = defaultdict(WeakSet)
+        self._on_batch_callbacks = WeakSet()
+        self._arg_specs = OrderedDict()
+        self._pending_specs = OrderedDict()
         super().__init__(*args, **kwargs)
 
+    def __getattr__(self, key):
+        # only reached for missing attributes. Options rebuilt from a pickle
+        # have no properties or arguments until first needed
+        if self.__dict__.get('_pending_specs'):
+            self._materialize()
+            return getattr(self, key)
+        raise AttributeError(key)
+
+    def __reduce__(self):
+        specs = list(chain(self._arg_specs.items(),
+                           self._pending_specs.items()))
+        # copies are made from per instance classes, skip all of them
+        cls = next(cls for cls in type(self).__mro__
+                   if '_per_instance' not in cls.__dict__)
+        return _rebuild_options, (cls, list(self.items()), specs)
+
+    def _materialize(self):
+        pending, self._pending_specs = self._pending_specs, OrderedDict()
+        for key, kwargs in pending.items():
+            self._add_option(key, kwargs)
+
+    def _add_option(self, key, kwargs):
+        setattr(self.__class__, key, property(partial(self._getter, key),
+                                    partial(self._setter, key)))
+
+        cli_key = key.replace('_', '-')
+        short_arg = self.find_short_arg(key)
+        if short_arg is not None:
+            args = ['-' + short_arg]
+        else:
+            args = []
+        args.append('--' + cli_key)
+
+        self._arg_specs[key] = dict(kwargs)
+        return self._argsparser.add_argument(*args, dest=key, **kwargs)
+
     @staticmethod
     def _getter(key, self):
         return self[key]
@@ -71,26 +127,42 @@ class Options(OrderedDict):
     def set_callback(self, key, callback):
         self._on_change_callbacks[key].add(callback)
 
+    def set_batch_callback(self, callback):
+        """
+        Call callback(changes) once per update_many, or load_*, that changes
+        anything, with a dict of the changed keys and their new values. Held
+        weakly like the callbacks of set_callback
+        """
+        self._on_batch_callbacks.add(callback)
+
     def trigger_callbacks(self, key):
+        if tracing.tracer is not None:
+            with tracing.tracer.caused('option', key, value=self[key]):
+                return self._trigger_callbacks(key)
+        return self._trigger_callbacks(key)
+
+    def _trigger_callbacks(self, key):
+        value = self[key]
         for callback in self._on_change_callbacks[key]:
-            callback(key, self[key])
+            callback(key, value)
+        for callback in self._on_change_callbacks.get(None, ()):
+            callback(key, value)
+
+    def subscribe(self, *keys):
+        """
+        Subscribe to changes of keys, or of all keys if none are given
+        :param keys: option names to watch
+        :return: OptionsSubscription
+        """
+        return OptionsSubscription(self, keys)
 
     def __setitem__(self, key, value):
         if key not in self or not hasattr(self, key):
             if not isinstance(key, str):
                 raise ValueError('option names must be of type string')
-            setattr(self.__class__, key, property(partial(self._getter, key),
-                                        partial(self._setter, key)))
-
-            cli_key = key.replace('_', '-')
-            short_arg = self.find_short_arg(key)
-            if short_arg is not None:
-                args = ['-' + short_arg]
-            else:
-                args = []
-            args.append('--' + cli_key)
+            if self._pending_specs:
+                self._materialize()
 
-            arg = partial(self._argsparser.add_argument, *args, dest=key)
             kwargs = dict()
             if isinstance(value, dict):
                 kwargs.update(value)
@@ -100,7 +172,7 @@ class Options(OrderedDict):
 
             if 'type' not in kwargs and value is not None:
                 kwargs['type'] = type(value)
-            action = arg(**kwargs)
+            action = self._add_option(key, kwargs)
             if hasattr(action, 'default') and action.default is not None:
                 value = action.default
 
@@ -113,7 +185,8 @@ class Options(OrderedDict):
 
         trigger_callback = False
         if key in self:
-            if key in self._on_change_callbacks and value != self[key]:
+            callbacks = self._on_change_callbacks
+            if (key in callbacks or None in callbacks) and value != self[key]:
                 trigger_callback = True
 
         super().__setitem__(key, value)
@@ -121,6 +194,8 @@ class Options(OrderedDict):
             self.trigger_callbacks(key)
 
     def parseargs(self, *args):
+        if self._pending_specs:
+            self._materialize()
         if len(args) < 1:
             args = None
         else:
@@ -137,13 +212,24 @@ class Options(OrderedDict):
         :return:
         """
         class Options(cls):
-            pass
+            # one class per instance, holding its option properties
+            _per_instance = True
         kwargs['_make_called'] = True
         return Options(*args, **kwargs)
 
     def copy(self):
         return self.make(self.items())
 
+    def snapshot(self):
+        """
+        Copy of the current values whose options are registered lazily, like
+        those of an unpickled instance. Much cheaper than copy for large
+        Options that are read by item only
+        :return: Options
+        """
+        rebuild, args = self.__reduce__()
+        return rebuild(*args)
+
     def bind_copy_to_parser(self, subparser: ArgumentParser):
         opt = self.make()
         opt._argsparser = subparser
@@ -157,6 +243,278 @@ class Options(OrderedDict):
         else:
             args = list()
 
-        for key, val in chain(kwargs.items(), args):
+        self.update_many((key, val) for key, val in chain(kwargs.items(), args)
+                         if key in self)
+
+    def update_many(self, items, coerce=False):
+        """
+        Set many options in one pass.
+        New options are registered lazily, in one step on first attribute
+        access or parse. Callbacks fire only after all values are in place:
+        those of set_callback once per changed key, then those of
+        set_batch_callback once with all the changes.
+        :param items: mapping or iterable of (key, value) pairs
+        :param coerce: cast values of existing options to their option type
+        :return: list of changed keys
+        """
+        if isinstance(items, Mapping):
+            items = items.items()
+
+        set_item = OrderedDict.__setitem__
+        changed = OrderedDict()
+        for key, value in items:
             if key in self:
-                self[key] = val
\ No newline at end of file
+                if coerce:
+                    value = self._coerce(key, value)
+                if value != self[key]:
+                    changed[key] = None
+                set_item(self, key, value)
+
+            elif isinstance(value, dict):
+                # argparse spec, the action decides the actual value
+                self[key] = value
+
+            else:
+                if not isinstance(key, str):
+                    raise ValueError('option names must be of type string')
+                kwargs = dict(default=value)
+                if value is not None:
+                    kwargs['type'] = type(value)
+                self._pending_specs[key] = kwargs
+                set_item(self, key, value)
+
+        callbacks = self._on_change_callbacks
+        for key in changed:
+            if key in callbacks or None in callbacks:
+                self.trigger_callbacks(key)
+        if changed and self._on_batch_callbacks:
+            changes = OrderedDict((key, self[key]) for key in changed)
+            for callback in list(self._on_batch_callbacks):
+                callback(changes)
+        return list(changed)
+
+    def _coerce(self, key, value):
+        spec = self._arg_specs.get(key) or self._pending_specs.get(key, {})
+        _type = spec.get('type')
+        if _type is None and self[key] is not None:
+            _type = type(self[key])
+
+        if _type is None or isinstance(value, _type):
+            return value
+        if _type is bool and isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        return _type(value)
+
+    def load_json(self, source, chunk_size=1 << 16):
+        """
+        Load the members of a top-level JSON object, streaming from source
+        :param source: path or text file object
+        :return: list of changed keys
+        """
+        with _open_source(source) as fp:
+            return self.update_many(iter_json_items(fp, chunk_size))
+
+    def load_ini(self, source, section=None):
+        """
+        Load an INI file. String values are coerced to the option types
+        :param source: path or text file object
+        :param section: only load this section, default is all sections
+        :return: list of changed keys
+        """
+        with _open_source(source) as fp:
+            return self.update_many(iter_ini_items(fp, section), coerce=True)
+
+    def load_env(self, prefix, environ=None):
+        """
+        Load environment variables named prefix + option name, case
+        insensitive. String values are coerced to the option types
+        :param prefix: e.g. 'MYAPP_'
+        :param environ: mapping to read instead of os.environ
+        :return: list of changed keys
+        """
+        return self.update_many(iter_env_items(prefix, environ), coerce=True)
+
+
+@contextmanager
+def _open_source(source):
+    if isinstance(source, str):
+        with open(source) as fp:
+            yield fp
+    else:
+        yield source
+
+
+def iter_json_items(fp, chunk_size=1 << 16):
+    """
+    Yield (key, value) pairs of a top-level JSON object without reading the
+    whole document into memory
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip(chars=' \t\r\n'):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def expect(*tokens):
+        nonlocal pos
+        skip()
+        if pos >= len(buf) or buf[pos] not in tokens:
+            raise json.JSONDecodeError('Expecting one of {!r}'.format(tokens),
+                                       buf, pos)
+        pos += 1
+        return buf[pos - 1]
+
+    def value():
+        nonlocal pos
+        skip()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # a value ending exactly at the buffer end may be a truncated
+                # number or literal, only trust it with lookahead
+                if end < len(buf) or eof:
+                    pos = end
+                    return obj
+            fill()
+
+    fill()
+    expect('{')
+    skip()
+    if pos < len(buf) and buf[pos] == '}':
+        return
+    while True:
+        key = value()
+        expect(':')
+        yield key, value()
+        if expect(',', '}') == '}':
+            return
+
+
+def iter_ini_items(fp, section=None):
+    parser = ConfigParser()
+    parser.optionxform = str
+    parser.read_file(fp)
+    if section is not None:
+        yield from parser.items(section)
+    elif parser.sections():
+        for name in parser.sections():
+            yield from parser.items(name)
+    else:
+        yield from parser.defaults().items()
+
+
+def iter_env_items(prefix, environ=None):
+    environ = os.environ if environ is None else environ
+    prefix = prefix.upper()
+    for name, value in environ.items():
+        if name.upper().startswith(prefix):
+            yield name[len(prefix):].lower(), value
+
+
+class OptionsSubscription:
+    """
+    Asynchronous stream of changes to an Options instance
+
+    Iterating yields dicts of changed keys and their latest values. Changes
+    are coalesced per key until the consumer gets to them, so writers never
+    wait on a slow consumer and the backlog never exceeds one entry per key.
+    Writes may happen from any thread.
+
+    Keep a reference to the subscription for as long as it is used, the
+    underlying callback is held weakly like any other.
+    """
+    def __init__(self, opt: Options, keys=tuple()):
+        self.opt = opt
+        self.keys = tuple(keys) or (None,)
+        self.closed = False
+        self._changes = OrderedDict()
+        self._lock = Lock()
+        # made by get on the loop of the consumer, asyncio.Event binds to one
+        self._event = None
+        self._loop = None
+        self._loop_thread = None
+        self._callback = self._on_change
+        for key in self.keys:
+            opt.set_callback(key, self._callback)
+
+    def _on_change(self, key, value):
+        with self._lock:
+            self._changes[key] = value
+        self._wakeup()
+
+    def _wakeup(self):
+        with self._lock:
+            event, loop, loop_thread = self._event, self._loop, self._loop_thread
+        if event is None:
+            # get checks for changes before it waits
+            return
+        if loop_thread == get_ident():
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    async def get(self):
+        """
+        Wait for and return the changes made since the last call
+        :return: dict of changed keys and their latest values
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._loop is not loop:
+                    self._event = asyncio.Event()
+                    self._loop = loop
+                    self._loop_thread = get_ident()
+                event = self._event
+                changes, self._changes = self._changes, OrderedDict()
+                event.clear()
+            if changes:
+                return changes
+            if self.closed:
+                raise StopAsyncIteration
+            await event.wait()
+
+    def close(self):
+        self.closed = True
+        for key in self.keys:
+            self.opt._on_change_callbacks[key].discard(self._callback)
+        self._wakeup()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _rebuild_options(cls, items, specs):
+    opt = cls.make()
+    for key, value in items:
+        OrderedDict.__setitem__(opt, key, value)
+    opt._pending_specs.update(specs)
+    return opt
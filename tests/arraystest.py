@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+from elymetaclasses.annotations import SingleDispatchMetaClass, vectorized
+from elymetaclasses.arrays import Array, array_of
+from elymetaclasses.utils import FailAssert
+
+
+class FakeArray:
+    """ Duck-typed stand-in for numpy.ndarray """
+    def __init__(self, dtype, ndim, order='C'):
+        self.dtype = dtype
+        self.ndim = ndim
+        self.flags = SimpleNamespace(c_contiguous=order == 'C',
+                                     f_contiguous=order == 'F')
+
+
+class OtherArray(FakeArray):
+    pass
+
+
+class UnhashableDtype:
+    """ dtype that cannot be part of a cache key """
+    name = 'float32'
+    __hash__ = None
+
+
+class AuxArrays(metaclass=SingleDispatchMetaClass):
+    dispatch_mode = 'specific'
+
+    def kind(self, data):
+        return 'generic'
+
+    def kind(self, data: FakeArray):
+        return 'array'
+
+    def kind(self, data: array_of('float32')):
+        return 'float32'
+
+    def kind(self, data: array_of('float32', ndim=2)):
+        return 'float32 2d'
+
+    def kind(self, data: array_of('float64', contiguous='F')):
+        return 'float64 fortran'
+
+    @vectorized
+    def kind(self, data: array_of('int64', ndim=1)):
+        return ['int64 1d batch'] * len(data)
+
+
+class AuxArraysFirst(metaclass=SingleDispatchMetaClass):
+    def kind(self, data: array_of(ndim=(1, 2))):
+        return 'vector or matrix'
+
+    def kind(self, data):
+        return 'generic'
+
+
+class TestArrays:
+    def test_match(self):
+        assert isinstance(FakeArray('float32', 1), Array)
+        assert not isinstance(1.5, Array)
+        assert isinstance(FakeArray('float32', 1), array_of('float32'))
+        assert not isinstance(FakeArray('float64', 1), array_of('float32'))
+        assert isinstance(FakeArray('int8', 3), array_of(ndim=(2, 3)))
+        assert not isinstance(FakeArray('int8', 1), array_of(ndim=(2, 3)))
+        assert isinstance(FakeArray('int8', 2, 'F'), array_of(contiguous='F'))
+        assert not isinstance(FakeArray('int8', 2), array_of(contiguous='F'))
+        assert not isinstance(FakeArray('int8', 2), array_of(base=OtherArray))
+        assert isinstance(OtherArray('int8', 2), array_of(base=FakeArray))
+
+        # specs are made once and checks cached per type, dtype and ndim
+        assert array_of('float32', 2) is array_of('float32', ndim=[2])
+        spec = array_of('float16')
+        isinstance(FakeArray('float16', 1), spec)
+        assert spec._matches == {(FakeArray, 'float16', 1): True}
+
+        with FailAssert(ValueError):
+            array_of(contiguous='X')
+
+    def test_dispatch(self):
+        aux = AuxArrays()
+        assert aux.kind(1) == 'generic'
+        assert aux.kind(FakeArray('int8', 1)) == 'array'
+        assert aux.kind(FakeArray('float32', 1)) == 'float32'
+        # the more constrained spec wins, even though they share a type
+        assert aux.kind(FakeArray('float32', 2)) == 'float32 2d'
+        assert aux.kind(FakeArray('float32', 1)) == 'float32'
+        assert aux.kind(FakeArray('float64', 2, 'F')) == 'float64 fortran'
+        assert aux.kind(FakeArray('float64', 2, 'C')) == 'array'
+
+        assert AuxArraysFirst().kind(FakeArray('int8', 2)) == 'vector or matrix'
+        assert AuxArraysFirst().kind(FakeArray('int8', 3)) == 'generic'
+
+        # resolved without caching
+        unhashable = FakeArray(UnhashableDtype(), 2)
+        assert aux.kind(unhashable) == 'float32 2d'
+        assert AuxArrays.kind.resolve((aux, unhashable))(aux, unhashable) == \
+            'float32 2d'
+        assert AuxArrays.kind.map([(aux, unhashable), (aux, unhashable)]) == \
+            ['float32 2d'] * 2
+
+    def test_map(self):
+        aux = AuxArrays()
+        arrays = [FakeArray('int64', 1), FakeArray('float32', 2),
+                  FakeArray('int64', 1), FakeArray('float32', 1)]
+        assert AuxArrays.kind.map((aux, data) for data in arrays) == [
+            'int64 1d batch', 'float32 2d', 'int64 1d batch', 'float32']
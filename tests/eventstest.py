@@ -1,6 +1,11 @@
 from elymetaclasses.utils import FailAssert, Options
-from elymetaclasses.events import ChainedProps, IllegalConstruction, GlobalFuncName, args_from_opt
+from elymetaclasses import tracing
+from elymetaclasses.events import ChainedProps, IllegalConstruction, GlobalFuncName, args_from_opt, sweep, stale_while_revalidate, prewarm, _missing, streaming, StreamInvalidated, ChunkStream
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
 import abc
+import json
+import sys
 from collections import defaultdict
 
 changes = defaultdict(int)
@@ -47,6 +52,87 @@ class SuperChained(Chained):
         return super().test + 'super'
 
 
+class SweepChained(ChainedProps):
+    @property
+    def base(self, hej):
+        changes['base'] += 1
+        return hej
+
+    @property
+    def left(self, med):
+        changes['left'] += 1
+        return self.base + med
+
+    @property
+    def right(self, dig):
+        changes['right'] += 1
+        return self.base + dig
+
+    @property
+    def total(self):
+        return self.left + self.right
+
+
+class StaleChained(ChainedProps):
+    revalidate_executor = ThreadPoolExecutor(1)
+    gate = Event()
+
+    @property
+    @stale_while_revalidate
+    def slow(self, hej):
+        self.gate.wait()
+        changes['slow'] += 1
+        return hej * 2
+
+    @property
+    def reader(self, med):
+        changes['reader'] += 1
+        return self.slow + med
+
+
+class MemoChained(ChainedProps):
+    @args_from_opt(1, memoize=2)
+    def scaled(self, value, hej):
+        changes['scaled'] += 1
+        return value * hej
+
+    @args_from_opt(2, memoize=True)
+    def pair(self, first, second=None, hej=0):
+        return first, second, hej
+
+    @property
+    def doubled(self):
+        return self.scaled(2)
+
+    @property
+    def scale(self, hej):
+        return hej * 2
+
+    @args_from_opt(1, memoize=True)
+    def rescaled(self, x, med=1):
+        return x * self.scale * med
+
+
+class StreamChained(ChainedProps):
+    @property
+    def scale(self, hej):
+        return hej
+
+    @property
+    @streaming(spill_after=2)
+    def numbers(self, n):
+        try:
+            for i in range(n):
+                changes['numbers'] += 1
+                yield i * self.scale
+        finally:
+            changes['numbers closed'] += 1
+
+    @property
+    def total(self):
+        return sum(self.numbers)
+
+
 class FailChained(ChainedProps):
     @property
     def kwarg_fun(self, **wrong):
@@ -150,3 +236,348 @@ class TestChained:
         assert chained.kwargmethod() == 'dynfoobar'
         assert chained.kwargmethod(med='boo') == 'dynfooboo'
         assert chained.nothrill() == 'dynfoobar'
+
+    def test_slots(self):
+        class Slotted(ChainedProps):
+            __slots__ = ()
+
+            @property
+            def first(self, hej):
+                return hej + '1'
+
+        class Other(ChainedProps):
+            __slots__ = ()
+
+            @property
+            def second(self, hej):
+                return hej + '2'
+
+        class Both(Slotted, Other):
+            __slots__ = ()
+
+            @property
+            def both(self):
+                return self.first + self.second
+
+        opt = Options.make(hej='foo')
+        both = Both(opt)
+        assert not hasattr(both, '__dict__')
+
+        # Other.second is not in its home slot in Both
+        assert Both._slot_layout[:1] == Slotted._slot_layout
+        assert Both._slot_layout.index(GlobalFuncName('Other', 'second')) != 0
+        assert both.both == 'foo1foo2'
+        assert GlobalFuncName('Both', 'both') in \
+            both._dependencies[GlobalFuncName('Other', 'second')]
+
+        opt.hej = 'bar'
+        assert both.both == 'bar1bar2'
+
+        both.second = 'set'
+        assert both.both == 'bar1set'
+        del both.second
+        assert both.both == 'bar1bar2'
+
+    def test_sweep(self):
+        opt = Options.make(hej='h', med='m', dig='d')
+        chained = SweepChained(opt)
+        assert chained.total == 'hmhd'
+        changes.clear()
+
+        grid = dict(med=['1', '2', '3'], dig=['a', 'b'])
+        expected = [hej + med + hej + dig for hej in 'h'
+                    for med in grid['med'] for dig in grid['dig']]
+        assert sweep(chained, 'total', grid) == expected
+
+        # base is shared, left and right are computed once per value
+        assert changes['base'] == 0
+        assert changes['left'] == 3
+        assert changes['right'] == 2
+
+        # the instance is untouched
+        assert opt.med == 'm'
+        assert chained.total == 'hmhd'
+
+        with ThreadPoolExecutor(2) as executor:
+            assert sweep(chained, 'total', grid, executor) == expected
+            for chunks in (1, 2, 100):
+                assert sweep(chained, 'total', grid, executor,
+                             chunks=chunks) == expected
+
+        points = [dict(hej='x'), dict(hej='y', med='2')]
+        assert sweep(chained, 'total', points) == ['xmxd', 'y2yd']
+
+    def test_stale_while_revalidate(self):
+        opt = Options.make(hej='a', med='!')
+        chained = StaleChained(opt)
+        chained.gate.set()
+        assert chained.reader == 'aa!'
+        changes.clear()
+
+        # stale values are served while recomputing in the background
+        chained.gate.clear()
+        opt.hej = 'b'
+        assert chained.slow == 'aa'
+        assert chained.reader == 'aa!'
+        chained.gate.set()
+        prewarm(chained, ['slow'], wait=True)
+        assert changes['slow'] == 1
+
+        # applying the fresh value drops dependants that read the stale one
+        assert chained.slow == 'bb'
+        assert chained.reader == 'bb!'
+
+        # prewarmed properties that are not stale_while_revalidate are
+        # waited for rather than computed by the reader
+        changes.clear()
+        opt.med = '?'
+        prewarm(chained, ['reader'])
+        assert chained.reader == 'bb?'
+        assert changes['reader'] == 1
+
+        with FailAssert(ValueError):
+            prewarm(chained, ['option_changed'])
+
+    def test_tracing(self):
+        opt = Options.make(hej='a', med='!', dig='d')
+        chained = SweepChained(opt)
+        chained.total
+
+        with tracing.trace(maxlen=100) as tracer:
+            opt.hej = 'b'
+            chained.total
+            del chained.right
+        assert tracing.tracer is None
+
+        # causes are recorded when handled, after what they caused
+        kinds = [(cat, name) for _, cat, name, *_ in tracer.events]
+        assert kinds[4] == ('option', 'hej')
+        assert set(kinds[:4]) == {('evict', 'SweepChained.' + name) for name
+                                  in ('base', 'left', 'right', 'total')}
+
+        # recomputes are linked to the option change that evicted them
+        cause = tracer.events[4][-1]['cause']
+        computes = [event for event in tracer.events if event[1] == 'compute']
+        assert len(computes) == 4
+        assert all(args['cause'] == cause for *_, args in computes)
+
+        evicts = [args['by'] for _, cat, *_, args in tracer.events
+                  if cat == 'evict']
+        assert evicts[0] == "'hej'"
+        assert evicts[-1] == 'SweepChained.right'
+
+        trace = tracer.chrome_trace()
+        assert {'s', 'f', 'X', 'i'} <= set(e['ph'] for e in trace['traceEvents'])
+
+        # flows start inside the slice of their cause, or viewers drop them
+        slices = {e['args']['cause']: e for e in trace['traceEvents']
+                  if e['cat'] in ('option', 'invalidate')}
+        starts = [e for e in trace['traceEvents'] if e['ph'] == 's']
+        assert starts
+        for start in starts:
+            cause = slices[start['id']]
+            assert cause['ph'] == 'X' and cause['tid'] == start['tid']
+            assert cause['ts'] <= start['ts'] <= cause['ts'] + cause['dur']
+        json.dumps(trace)
+
+    def test_shared_options(self):
+        opt = Options.make(hej='a', med='!', dig='d')
+        instances = [SweepChained(opt) for _ in range(10)]
+        for chained in instances[:5]:
+            assert chained.left == 'a!'
+
+        # one callback per key, however many instances read it
+        assert len(opt._on_change_callbacks['hej']) == 1
+        binding = instances[0]._property_binding
+        assert set(binding.readers['hej']) == set(instances[:5])
+
+        changes.clear()
+        opt.hej = 'b'
+        assert 'hej' not in binding.readers
+        assert all(chained.left == 'b!' for chained in instances)
+        assert changes['left'] == 10
+        assert len(binding.readers['hej']) == 10
+
+        # copies get a binding of their own
+        assert SweepChained(opt.copy())._property_binding is not binding
+
+    def test_memoize(self):
+        opt = Options.make(hej=3)
+        chained = MemoChained(opt)
+        changes.clear()
+
+        assert chained.scaled(1) == 3
+        assert chained.scaled(1) == 3
+        assert chained.scaled(2) == 6
+        assert changes['scaled'] == 2
+
+        # bounded, least recently used first out
+        chained.scaled(1)
+        chained.scaled(4)
+        chained.scaled(1)
+        assert changes['scaled'] == 3
+        chained.scaled(2)
+        assert changes['scaled'] == 4
+
+        # dropped with the options it read, and so are its dependants
+        assert chained.doubled == 6
+        opt.hej = 5
+        assert chained.scaled(1) == 5
+        assert chained.doubled == 10
+
+        # unhashable arguments are passed through
+        assert chained.scaled([0]) == [0] * 5
+
+        # keyword calls never share an entry with positional ones
+        assert chained.pair(1, second=2) == (1, 2, 5)
+        assert chained.pair((1,), frozenset({('second', 2)})) == \
+            ((1,), frozenset({('second', 2)}), 5)
+
+        # dropped with the properties it read
+        assert chained.rescaled(3) == 30
+        opt.hej = 10
+        assert chained.rescaled(3) == 60
+        del chained.scale
+        assert chained.rescaled(3) == 60
+
+    def test_options_callback(self):
+        opt = Options.make(hej='h', med='m', dig='d', other=0)
+        chained = SweepChained(opt)
+        assert chained.total == 'hmhd'
+        base = GlobalFuncName('SweepChained', 'base')
+        callback = chained.options_callback(base)
+        assert chained.options_callback(base) is callback
+
+        # evicts the named property and its dependants, whatever the key
+        opt.set_callback('other', chained.options_callback(base))
+        changes.clear()
+        opt.other = 1
+        assert chained.total == 'hmhd'
+        assert changes == {'base': 1, 'left': 1, 'right': 1}
+
+        chained.del_callback(GlobalFuncName('SweepChained', 'right'),
+                             'other', 2)
+        assert chained.total == 'hmhd'
+        assert changes['right'] == 2 and changes['base'] == 1
+
+    def test_closures(self):
+        # edges are shared by all instances of a class, start afresh
+        class Fresh(SweepChained):
+            pass
+
+        opt = Options.make(hej='h', med='m', dig='d')
+        chained = Fresh(opt)
+        dependencies = chained._dependencies
+        slot = Fresh._slot_of
+        base, left, right, total = (slot[GlobalFuncName('SweepChained', name)]
+                                    for name in ('base', 'left', 'right',
+                                                 'total'))
+        chained.left
+        assert dependencies.option_closure('hej') == {base, left}
+        assert dependencies.closure(left) == {left}
+
+        # closures grow as edges are found
+        chained.total
+        assert dependencies.option_closure('hej') == {base, left, right, total}
+        assert dependencies.option_closure('dig') == {right, total}
+        assert dependencies.closure(left) == {left, total}
+
+        opt.hej = 'x'
+        assert chained._property_values.count(_missing) == 4
+        assert chained.total == 'xmxd'
+
+    def test_streaming(self):
+        opt = Options.make(hej=2, n=5)
+        chained = StreamChained(opt)
+        changes.clear()
+
+        # the dependant consumes the chunks as they are produced
+        numbers = chained.numbers
+        assert changes['numbers'] == 0
+        assert next(iter(numbers)) == 0
+        assert changes['numbers'] == 1
+        assert chained.total == 20
+        assert changes['numbers'] == 5
+
+        # replayed, partly from disk, without producing again
+        assert chained.numbers is numbers
+        assert list(numbers) == [0, 2, 4, 6, 8]
+        assert len(numbers._memory) == 2 and len(numbers._offsets) == 3
+        assert changes['numbers'] == 5
+
+        # the producer depends on what it read while producing
+        opt.hej = 3
+        assert chained.total == 30
+        with FailAssert(StreamInvalidated):
+            list(numbers)
+
+        # invalidation stops a producer in progress and frees its chunks
+        del chained.numbers
+        numbers = chained.numbers
+        reader = iter(numbers)
+        for _ in range(3):
+            next(reader)
+        spill = numbers._file
+        assert not spill.closed
+        changes.clear()
+        opt.n = 3
+        assert changes['numbers closed'] == 1
+        assert spill.closed
+        with FailAssert(StreamInvalidated):
+            next(reader)
+        assert changes['numbers'] == 0
+        assert chained.total == 9
+
+        # also when the producer invalidates itself
+        def restart(self):
+            yield 1
+            del self.numbers
+            yield 2
+
+        stream = ChunkStream(chained, StreamChained._slot_of[
+            GlobalFuncName('StreamChained', 'numbers')], restart(chained))
+        chained._property_values[stream._slot] = stream
+        with FailAssert(StreamInvalidated):
+            list(stream)
+        assert stream.done
+
+    def test_concurrent_closures(self):
+        # threads find the edges of a fresh class at the same time
+        body = ['class Wide(ChainedProps):',
+                '    @property',
+                '    def root(self, hej):',
+                '        return hej']
+        for i in range(60):
+            body.append('    @property\n'
+                        '    def prop_{0}(self):\n'
+                        '        return self.root + {0}'.format(i))
+            body.append('    @property\n'
+                        '    def top_{0}(self):\n'
+                        '        return self.prop_{0} + self.prop_{1}'.format(
+                            i, (i + 1) % 60))
+
+        def read(cls, names):
+            chained = cls(Options.make(hej=1))
+            chained._dependencies.option_closure('hej')
+            return [getattr(chained, name) for name in names]
+
+        names = ['top_{}'.format(i) for i in range(60)]
+        interval = sys.getswitchinterval()
+        # switch threads as often as possible to interleave them
+        sys.setswitchinterval(1e-6)
+        try:
+            self.check_concurrent_closures('\n'.join(body), read, names)
+        finally:
+            sys.setswitchinterval(interval)
+
+    def check_concurrent_closures(self, source, read, names):
+        with ThreadPoolExecutor(8) as executor:
+            for _ in range(20):
+                namespace = dict(ChainedProps=ChainedProps)
+                exec(source, namespace)
+                cls = namespace['Wide']
+                results = list(executor.map(
+                    read, [cls] * 8,
+                    [names[i * 7:] + names[:i * 7] for i in range(8)]))
+                assert all(len(result) == 60 for result in results)
+                assert len(cls._dependencies.option_closure('hej')) == 121
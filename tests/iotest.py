@@ -0,0 +1,141 @@
+import asyncio
+import mmap
+import os
+import subprocess
+import sys
+from io import BufferedReader, BytesIO, FileIO, StringIO
+from tempfile import TemporaryFile
+
+from elymetaclasses.annotations import SingleDispatchMetaClass
+from elymetaclasses.abc.io import (InputStream, OutputStream, ReadIntoStream,
+                                   ReadInto1Stream, MemoryviewStream,
+                                   AsyncInputStream, AsyncOutputStream,
+                                   AsyncIOStream)
+from elymetaclasses.abc.streams import iter_chunks, iter_split, tee, to_async
+
+
+class AuxCopier(metaclass=SingleDispatchMetaClass):
+    def copy(self, src, dst):
+        return 'generic'
+
+    def copy(self, src: ReadIntoStream, dst: MemoryviewStream):
+        return 'zerocopy'
+
+
+class TestZeroCopy:
+    def test_readinto(self):
+        assert isinstance(BytesIO(), ReadInto1Stream)
+        assert isinstance(BufferedReader(BytesIO()), ReadInto1Stream)
+        with TemporaryFile() as fp:
+            assert isinstance(FileIO(fp.fileno(), closefd=False),
+                              ReadIntoStream)
+            assert not isinstance(FileIO(fp.fileno(), closefd=False),
+                                  ReadInto1Stream)
+
+        assert not isinstance(StringIO(), ReadIntoStream)
+        assert isinstance(BytesIO(), InputStream)
+        assert issubclass(ReadIntoStream, InputStream)
+
+    def test_lazy_import(self):
+        # registrations stay lazy, _pyio is only needed once checked against
+        code = ('import sys, elymetaclasses.abc.io as io\n'
+                'assert "_pyio" not in sys.modules\n'
+                'assert issubclass(io.ReadIntoStream, io.InputStream)\n'
+                'assert "_pyio" in sys.modules\n')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+
+    def test_memoryview(self):
+        with TemporaryFile() as fp:
+            fp.write(b'0' * 16)
+            fp.flush()
+            buf = mmap.mmap(fp.fileno(), 16)
+            assert isinstance(buf, MemoryviewStream)
+            assert isinstance(buf, OutputStream)
+            buf.close()
+            assert isinstance(fp, MemoryviewStream)
+
+        assert isinstance(BytesIO(), MemoryviewStream)
+        assert not isinstance(StringIO(), MemoryviewStream)
+
+    def test_dispatch(self):
+        copier = AuxCopier()
+        assert copier.copy(BytesIO(), BytesIO()) == 'zerocopy'
+        assert copier.copy(StringIO(), BytesIO()) == 'generic'
+        assert copier.copy(BytesIO(), StringIO()) == 'generic'
+
+
+class AuxAsyncReader:
+    async def read(self, n=-1):
+        return b''
+
+
+class AuxNotAsyncReader:
+    def read(self, n=-1):
+        return b''
+
+
+class TestAsync:
+    def test_hooks(self):
+        assert issubclass(asyncio.StreamReader, AsyncInputStream)
+        assert issubclass(asyncio.StreamWriter, AsyncOutputStream)
+        assert isinstance(AuxAsyncReader(), AsyncInputStream)
+        assert not isinstance(AuxNotAsyncReader(), AsyncInputStream)
+        assert not isinstance(BytesIO(), AsyncInputStream)
+        assert not isinstance(BytesIO(), AsyncOutputStream)
+        assert not issubclass(asyncio.StreamReader, InputStream)
+
+    def test_to_async(self):
+        async def roundtrip():
+            source = to_async(BytesIO(b'line1\nline2\n'))
+            sink = to_async(BytesIO())
+            assert isinstance(source, AsyncIOStream)
+            assert to_async(source) is source
+
+            sink.write(await source.readline())
+            sink.write(await source.read())
+            assert sink.stream.getvalue() == b''
+            await sink.drain()
+            return sink.stream.getvalue()
+
+        assert asyncio.run(roundtrip()) == b'line1\nline2\n'
+
+
+class AuxReader:
+    def __init__(self, data):
+        self.stream = BytesIO(data)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def close(self):
+        pass
+
+
+class TestChunks:
+    def test_chunks(self):
+        chunks = list(iter_chunks(AuxReader(b'abcdefg'), 3))
+        assert chunks == [b'abc', b'def', b'g']
+
+        # readinto streams reuse one buffer
+        views = list(iter_chunks(BytesIO(b'abcdefg'), 3, reuse_buffer=True))
+        assert all(isinstance(view, memoryview) for view in views)
+        assert views[0].obj is views[1].obj
+        assert list(iter_chunks(BytesIO(b'abcdefg'), 3)) == chunks
+
+    def test_split(self):
+        data = b'first::second:::third::'
+        for size in range(1, len(data) + 1):
+            assert list(iter_split(BytesIO(data), b'::', size)) == \
+                [b'first', b'second', b':third']
+        assert list(iter_split(StringIO('a\nb\n\nc'), size=2,
+                               keepends=True)) == ['a\n', 'b\n', '\n', 'c']
+
+    def test_tee(self):
+        sinks = BytesIO(), BytesIO()
+        assert tee(BytesIO(b'x' * 1000), *sinks, size=64) == 1000
+        assert all(sink.getvalue() == b'x' * 1000 for sink in sinks)
+
+        text = StringIO()
+        assert tee(StringIO('y' * 100), text, size=7) == 100
+        assert text.getvalue() == 'y' * 100
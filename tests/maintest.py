@@ -1,5 +1,14 @@
 __author__ = 'emil'
+import inspect
+import sys
+import warnings
+from collections.abc import Sized
 from elymetaclasses import *
+from elymetaclasses.annotations import (vectorized, code_layout,
+                                        profile_dispatch, profiling_dispatch,
+                                        unprofile_dispatch, sample_gaps,
+                                        TypeAssertWarning)
+from elymetaclasses.abc.base import clear_abc_caches
 from elymetaclasses.utils import FailAssert
 
 class Dummy(object):
@@ -9,6 +18,10 @@ class Dummy2(object):
     pass
 
 
+class DummySub(Dummy):
+    pass
+
+
 class AuxSingleDispatch1(metaclass=SingleDispatchMetaClass):
     def inherited_func(self, arg: tuple):
         return 'tuple'
@@ -63,6 +76,78 @@ class AuxSingleDispatch(AuxSingleDispatch2, AuxSingleDispatch3):
         return 'int', 'empty'
 
 
+class AuxBatch(metaclass=SingleDispatchMetaClass):
+    calls = 0
+
+    def scale(self, value):
+        return 'default'
+
+    def scale(self, value: int):
+        AuxBatch.calls += 1
+        return value * 2
+
+    @vectorized
+    def scale(self, value: float):
+        AuxBatch.calls += 1
+        return [v * 3 for v in value]
+
+    @staticmethod
+    def pair(first, second):
+        return 'default'
+
+    @staticmethod
+    @vectorized
+    def pair(first: int, second: int):
+        return [(f, s) for f, s in zip(first, second)]
+
+
+class AuxSpecific(metaclass=SingleDispatchMetaClass):
+    dispatch_mode = 'specific'
+
+    def func(self, first, second):
+        return 'default'
+
+    def func(self, first: object, second: int):
+        return 'object', 'int'
+
+    def func(self, first: Dummy, second: int):
+        return 'Dummy', 'int'
+
+    def func(self, first: DummySub, second: int):
+        return 'DummySub', 'int'
+
+    def func(self, first: Sized, second: str):
+        return 'Sized', 'str'
+
+    def func(self, first: list, second: str):
+        return 'list', 'str'
+
+
+class AuxSpecific2(AuxSpecific):
+    def func(self, first: DummySub, second: bool):
+        return 'DummySub', 'bool'
+
+
+@dispatch
+def aux_free(first, second):
+    return 'default'
+
+
+@dispatch
+def aux_free(first: int, second: str):
+    return 'int', 'str'
+
+
+@dispatch(mode='specific')
+def aux_free_specific(first: object):
+    return 'object'
+
+
+@dispatch
+def aux_free_specific(first: bool):
+    return 'bool'
+
+
 class TestSingledispatch:
     sd = AuxSingleDispatch()
     #def __init__(self):
@@ -103,7 +188,201 @@ class TestSingledispatch:
     def test_classmethod_default(self):
         assert self.sd.myclassmethod('hej', 1) == self.sd.__class__.__name__
 
+    def test_specific(self):
+        sd = AuxSpecific()
+        assert sd.func(Dummy(), 1) == ('Dummy', 'int')
+        assert sd.func(DummySub(), 1) == ('DummySub', 'int')
+        assert sd.func(DummySub(), 'a') == 'default'
+        assert sd.func(Dummy2(), 1) == ('object', 'int')
+        assert sd.func([], 'a') == ('list', 'str')
+        assert sd.func((), 'a') == ('Sized', 'str')
+        assert sd.func((), 1) == ('object', 'int')
+
+        # cached resolutions follow ABC registrations
+        class Late:
+            pass
+
+        assert sd.func(Late(), 'a') == 'default'
+        Sized.register(Late)
+        assert sd.func(Late(), 'a') == ('Sized', 'str')
+
+        sd2 = AuxSpecific2()
+        assert sd2.func(DummySub(), True) == ('DummySub', 'bool')
+        assert sd2.func(DummySub(), 1) == ('DummySub', 'int')
+        assert sd2.func([], 'a') == ('list', 'str')
+
+    def test_free_functions(self):
+        assert aux_free(1, 'a') == ('int', 'str')
+        assert aux_free('a', 1) == 'default'
+
+        @aux_free.register
+        def other_module(first: str, second: int):
+            return 'str', 'int'
+
+        assert other_module('a', 1) == ('str', 'int')
+        assert aux_free('a', 1) == ('str', 'int')
+
+        assert aux_free_specific(1) == 'object'
+        assert aux_free_specific(True) == 'bool'
+        @aux_free_specific.register
+        def none(first: type(None)):
+            return 'None'
+
+        assert aux_free_specific(None) == 'None'
+        assert aux_free_specific(True) == 'bool'
+        assert aux_free_specific.map([(1,), (False,)]) == ['object', 'bool']
+
+    def test_free_functions_local(self):
+        def make(n):
+            @dispatch
+            def scaled(value):
+                return 'default'
+
+            @dispatch(mode='specific')
+            def scaled(value: int):
+                return value * n
+            return scaled
+
+        # every call makes its own dispatched function
+        by_2, by_10 = make(2), make(10)
+        assert by_10(1) == 10
+        assert by_2(1) == 2
+        assert by_2('a') == 'default'
+
+    def test_map(self):
+        items = [1, 'a', 2.5, 3, 0.5]
+        expected = [self.sd.myfunc(item, 'b') for item in items]
+        assert AuxSingleDispatch.myfunc.map((self.sd, item, 'b')
+                                            for item in items) == expected
+        assert AuxSingleDispatch.mystaticfunc.map([(1, 1), ('a', 1)]) == \
+            [('int', 'empty'), 'default']
+
+    def test_batch(self):
+        aux1, aux2 = AuxBatch(), AuxBatch()
+        items = [1, 2.0, 'a', 3, 4.0]
+
+        # one call per instance for the vectorized overload
+        AuxBatch.calls = 0
+        assert AuxBatch.scale.map([(aux1, item) for item in items] +
+                                  [(aux2, 5.0)]) == \
+            [2, 6.0, 'default', 6, 12.0, 15.0]
+        assert AuxBatch.calls == 4
+        assert AuxBatch.pair.map([(1, 2), ('a', 2), (3, 4)]) == \
+            [(1, 2), 'default', (3, 4)]
+
+    def test_code_layout(self):
+        def func(first, second=1, *args, third, **kwargs):
+            pass
+
+        class OldCode:
+            """ code object of a python without positional-only parameters """
+            co_varnames = func.__code__.co_varnames
+            co_argcount = func.__code__.co_argcount
+            co_kwonlyargcount = func.__code__.co_kwonlyargcount
+            co_flags = func.__code__.co_flags
+
+        kind = inspect.Parameter
+        expected = (('first', kind.POSITIONAL_OR_KEYWORD),
+                    ('second', kind.POSITIONAL_OR_KEYWORD),
+                    ('args', kind.VAR_POSITIONAL),
+                    ('third', kind.KEYWORD_ONLY),
+                    ('kwargs', kind.VAR_KEYWORD))
+        assert code_layout(func.__code__) == expected
+        assert code_layout(OldCode()) == expected
+
+    def test_profile(self):
+        sd = AuxSpecific()
+        dispatched = AuxSpecific.__dict__['func']
+        with profiling_dispatch(AuxSpecific, 'func') as stats:
+            assert AuxSpecific.func is not dispatched
+            assert sd.func(Dummy(), 1) == ('Dummy', 'int')
+            assert sd.func(Dummy(), 2) == ('Dummy', 'int')
+            assert sd.func(object(), 'a') == 'default'
+            stats = stats['func']
+            assert stats.calls == 3
+            # the unannotated default matches anything
+            assert stats.fallbacks == 0
+            assert stats.misses == 2
+            assert stats.resolve_time > 0
+            hits = stats.as_dict()['hits']
+            assert hits.pop('AuxSpecific.func(self, first, second)') == 1
+            assert list(hits.values()) == [2]
+            stats.reset()
+            assert stats.as_dict()['calls'] == 0
+
+            # overriding subclasses are profiled along
+            assert AuxSpecific2().func(DummySub(), True) == ('DummySub', 'bool')
+            assert stats.calls == 1
+        assert AuxSpecific.__dict__['func'] is dispatched
+        assert not hasattr(AuxSpecific2.func, 'dispatch_stats')
+
+        # inherited methods are profiled on the subclass only
+        class Inheriting(AuxSpecific):
+            pass
+
+        with profiling_dispatch(Inheriting, 'func') as stats:
+            assert Inheriting().func(Dummy(), 1) == ('Dummy', 'int')
+            assert sd.func(Dummy(), 1) == ('Dummy', 'int')
+            assert stats['func'].calls == 1
+        assert 'func' not in Inheriting.__dict__
+
+        # only calls matching no overload fall back, whatever the default
+        for mode in ('first', 'specific'):
+            class Annotated(metaclass=SingleDispatchMetaClass):
+                dispatch_mode = mode
+
+                def f(self, x: int):
+                    return 'int'
+
+                def f(self, x: str):
+                    return 'str'
+
+            with profiling_dispatch(Annotated, 'f') as stats:
+                annotated = Annotated()
+                assert [annotated.f(x) for x in (1, 1, 's', 1.5)] == \
+                    ['int', 'int', 'str', 'int']
+                stats = stats['f']
+                assert (stats.calls, stats.fallbacks) == (4, 1)
+                assert sorted(stats.hits.values()) == [1, 2]
+
+        with FailAssert(AttributeError):
+            profile_dispatch(AuxSpecific, 'missing')
+        with FailAssert(TypeError):
+            profile_dispatch(AuxSpecific, 'dispatch_mode')
+
+        stats = profile_dispatch(AuxSingleDispatch, 'mystaticfunc')
+        assert AuxSingleDispatch.mystaticfunc(1, 1) == ('int', 'empty')
+        assert self.sd.mystaticfunc('a', 1) == 'default'
+        assert (stats.calls, stats.fallbacks, stats.misses) == (2, 0, 0)
+        unprofile_dispatch(AuxSingleDispatch, 'mystaticfunc')
+        assert isinstance(AuxSingleDispatch.__dict__['mystaticfunc'],
+                          staticmethod)
+        assert not hasattr(AuxSingleDispatch.mystaticfunc, 'dispatch_stats')
+
+        module = sys.modules[__name__]
+        with profiling_dispatch(module, 'aux_free') as stats:
+            assert aux_free(1, 'a') == ('int', 'str')
+            assert stats['aux_free'].calls == 1
+
+
+class AuxTypeAssertFirst(metaclass=TypeAssertMetaClass):
+    type_assert_first = 2
+
+    def myfunc(self, first: int, **kwargs):
+        return kwargs
+
+
+class AuxTypeAssertRate(AuxTypeAssertFirst):
+    type_assert_first = None
+    type_assert_rate = 0.5
+
+    def myfunc(self, first: int):
+        return "success"
+
 
+class AuxTypeAssertInherited(AuxTypeAssertFirst):
+    def myfunc(self, first: int):
+        return "success"
 
 
 class TestTypeAssert(metaclass=TypeAssertMetaClass):
@@ -129,6 +408,53 @@ class TestTypeAssert(metaclass=TypeAssertMetaClass):
         with FailAssert():
             self.myfunc3(Dummy(), None)
 
+    def test_kwargs(self):
+        assert AuxTypeAssertFirst().myfunc(1, key='value') == dict(key='value')
+
+    def test_sample_first(self):
+        aux = AuxTypeAssertFirst()
+        myfunc = AuxTypeAssertFirst.myfunc
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            aux.myfunc(1.5)
+            aux.myfunc(1)
+            # past the first two calls nothing is checked
+            for _ in range(10):
+                aux.myfunc('a')
+        assert myfunc.checks == 2
+        assert myfunc.violations == {(1, int, float): 1}
+        assert [warning.category for warning in caught] == [TypeAssertWarning]
+        assert 'argument 1 is float, not int' in str(caught[0].message)
+
+        # settings are inherited
+        with warnings.catch_warnings(record=True):
+            AuxTypeAssertInherited().myfunc('a')
+        assert AuxTypeAssertInherited.myfunc.violations == {(1, int, str): 1}
+
+    def test_sample_rate(self):
+        aux = AuxTypeAssertRate()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            for _ in range(1000):
+                assert aux.myfunc(1.5) == 'success'
+        myfunc = AuxTypeAssertRate.myfunc
+        assert 350 < myfunc.checks < 650
+        assert myfunc.violations == {(1, int, float): myfunc.checks}
+        assert len(caught) == myfunc.checks
+
+        # tiny rates do not round to a zero log
+        gaps = sample_gaps(rate=1e-20)
+        assert next(gaps) > 1e12
+        assert next(sample_gaps(rate=1)) == 1
+        assert next(sample_gaps(rate=2)) == 1
+
+        with FailAssert(ValueError):
+            class Invalid(metaclass=TypeAssertMetaClass):
+                type_assert_rate = -1
+
+                def myfunc(self, first: int):
+                    pass
+
 
 class AuxHooked0:
     pass
@@ -180,3 +506,74 @@ class TestHooked:
         assert isinstance(AuxHooked6(), AuxHooked5)
 
         assert isinstance(AuxHooked4(), AuxHooked5)
+
+    def test_cache_invalidation(self):
+        class Late:
+            def goose(self):
+                pass
+
+        assert not isinstance(Late(), AuxHooked1)
+        Late.typing = lambda self: None
+        HookedMetaClass.invalidate()
+        assert isinstance(Late(), AuxHooked1)
+
+        # mutating a hooked class clears the caches by itself
+        class LateHooked(HookedBase):
+            pass
+
+        assert not isinstance(LateHooked(), AuxHooked1)
+        LateHooked.goose = LateHooked.typing = lambda self: None
+        assert isinstance(LateHooked(), AuxHooked1)
+        del LateHooked.goose
+        assert not isinstance(LateHooked(), AuxHooked1)
+
+    def test_clear_abc_caches(self):
+        class OldABCMeta(type):
+            """ ABCMeta of a python without _abc_caches_clear """
+            _abc_invalidation_counter = 0
+
+        class Old(metaclass=OldABCMeta):
+            _abc_cache = {int}
+
+        clear_abc_caches(Old)
+        assert not Old._abc_cache
+        assert OldABCMeta._abc_invalidation_counter == 1
+
+    def test_dispatch_invalidation(self):
+        class Goose(metaclass=SingleDispatchMetaClass):
+            dispatch_mode = 'specific'
+
+            def kind(self, obj):
+                return 'default'
+
+            def kind(self, obj: AuxHooked1):
+                return 'goose'
+
+        class Late:
+            def goose(self):
+                pass
+
+        assert Goose().kind(Late()) == 'default'
+        # cached resolutions are dropped with the structural checks
+        Late.typing = lambda self: None
+        HookedMetaClass.invalidate()
+        assert Goose().kind(Late()) == 'goose'
+
+    def test_lazy_regs(self):
+        sys.modules.pop('sched', None)
+
+        class LazyHooked(HookedBase):
+            subclasshooks = ['notprovided']
+            subclassregs = ['sched.scheduler', 'collections:OrderedDict',
+                            AuxHooked0]
+
+        assert 'sched' not in sys.modules
+        assert isinstance(AuxHooked0(), LazyHooked)
+        assert 'sched' in sys.modules
+
+        import sched
+        from collections import OrderedDict
+        assert issubclass(sched.scheduler, LazyHooked)
+        assert isinstance(OrderedDict(), LazyHooked)
+        assert not isinstance(dict(), LazyHooked)
+
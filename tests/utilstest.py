@@ -1,3 +1,5 @@
+import asyncio
+import pickle
 import sys
 
 from argparse import ArgumentParser
@@ -121,6 +123,83 @@ class TestOptions:
         assert mydict['change'] is False
 
 
+    def test_subscribe(self):
+        opt1 = Options.make([('foo', 'bar')], hej='med', dig=1)
+        sub_all = opt1.subscribe()
+        sub_foo = opt1.subscribe('foo')
+
+        async def consume():
+            opt1.foo = 'mar'
+            opt1.foo = 'far'
+            opt1.hej = 'dig'
+            assert await sub_all.get() == {'foo': 'far', 'hej': 'dig'}
+            assert await sub_foo.get() == {'foo': 'far'}
+
+            # writers from other threads wake up the consumer
+            loop = asyncio.get_running_loop()
+            waiter = asyncio.ensure_future(sub_foo.get())
+            await loop.run_in_executor(None, opt1.__setitem__, 'foo', 'bar')
+            assert await asyncio.wait_for(waiter, 1) == {'foo': 'bar'}
+
+            opt1.dig = 2
+            sub_all.close()
+            assert [changes async for changes in sub_all] == [
+                {'foo': 'bar', 'dig': 2}]
+
+        asyncio.run(consume())
+
+        # closed subscriptions no longer receive changes
+        opt1.hej = 'mig'
+        assert not sub_all._changes
+        sub_foo.close()
+
+    def test_subscribe_wait(self):
+        # made outside of any event loop and used from two of them
+        opt1 = Options.make(foo='bar')
+        sub = opt1.subscribe('foo')
+
+        async def consume(value):
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, opt1.__setitem__, 'foo', value)
+            return await asyncio.wait_for(sub.get(), 1)
+
+        assert asyncio.run(consume('mar')) == {'foo': 'mar'}
+        assert asyncio.run(consume('far')) == {'foo': 'far'}
+        sub.close()
+
+    def test_load(self):
+        opt1 = Options.make([('foo', 'bar')], hej=1, dig=False, mig=1.5)
+        changes = list()
+        def callback(key, value):
+            changes.append((key, value, dict(opt1)))
+        opt1.set_callback(None, callback)
+        batches = list()
+        def batch_callback(batch):
+            batches.append(batch)
+        opt1.set_batch_callback(batch_callback)
+
+        # values are in place before any callback fires
+        assert opt1.load_json(StringIO('{"foo": "mar", "hej": 2, "new": 1}'),
+                              chunk_size=4) == ['foo', 'hej']
+        assert [key for key, _, _ in changes] == ['foo', 'hej']
+        assert changes[0][2]['hej'] == 2
+        assert opt1.new == 1
+        # and all changes of a load are notified together
+        assert batches == [{'foo': 'mar', 'hej': 2}]
+        opt1.load_json(StringIO('{"foo": "mar"}'))
+        assert len(batches) == 1
+
+        # strings from ini and environment are cast to the option types
+        opt1.load_ini(StringIO('[main]\nhej = 3\nmig = 2\n[other]\nfoo = x'),
+                      section='main')
+        assert opt1.hej == 3 and isinstance(opt1.mig, float)
+        opt1.load_env('APP_', {'APP_DIG': 'true', 'APP_FOO': 'env', 'HEJ': '4'})
+        assert opt1.dig is True and opt1.foo == 'env' and opt1.hej == 3
+
+        # lazily registered options still get arguments
+        opt1.parseargs('--new', 5)
+        assert opt1.new == 5
+
     def test_add2parser(self):
         opt1 = Options.make([('foo', 'bar')], hej='med')
         main_parser = ArgumentParser()
@@ -163,7 +242,39 @@ class TestOptions:
         assert opt2.dig is True
         assert opt1.dig is False
 
+        # snapshots register their arguments only when first needed
+        opt3 = opt1.snapshot()
+        assert opt3 == opt1 and not opt3._arg_specs
+        opt3.parseargs('-d')
+        assert opt3.dig is True and opt3.hej == 'med'
+        assert opt1.dig is False
 
+    def test_pickle(self):
+        opt1 = Options.make([('foo', 'bar'), ('hej', 10)],
+                            bar={'type': float, 'default': 10},
+                            dig={'action': 'store_true'})
+        opt1.foo = 'mar'
+        opt2 = pickle.loads(pickle.dumps(opt1))
 
+        assert opt2 == opt1
+        assert opt2.foo == 'mar'
+        assert isinstance(opt2.bar, float)
 
+        # arguments are rebuilt with the same flags and types
+        opt2.parseargs('-H11', '-b', 12, '-d')
+        assert opt2.hej == 11
+        assert isinstance(opt2.bar, float) and opt2.bar == 12
+        assert opt2.dig is True
+        assert opt1.hej == 10
 
+        # unpickled options can be pickled again before being touched
+        opt3 = pickle.loads(pickle.dumps(pickle.loads(pickle.dumps(opt1))))
+        opt3['new'] = 1
+        assert list(opt3) == ['foo', 'hej', 'bar', 'dig', 'new']
+        assert opt3.hej == 10 and opt3.new == 1
+
+        # so can copies, whose classes are made from per instance classes
+        opt4 = pickle.loads(pickle.dumps(opt1.copy()))
+        assert opt4 == opt1 and type(opt4).__base__ is Options
+        opt5 = opt1.bind_copy_to_parser(ArgumentParser())
+        assert pickle.loads(pickle.dumps(opt5)) == opt1